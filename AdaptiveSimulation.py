@@ -0,0 +1,135 @@
+import numpy as np
+from SystemEvents import TimedSimulation
+
+# Dormand-Prince 5(4) tableau, the 5th order solution is propagated and the last stage is reused (FSAL)
+C = [0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1]
+A = [[],
+     [1 / 5],
+     [3 / 40, 9 / 40],
+     [44 / 45, -56 / 15, 32 / 9],
+     [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+     [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+     [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84]]
+E = np.array([71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40])  # 5th - 4th order weights
+
+
+class AdaptiveSimulation(TimedSimulation):
+    # Error-controlled integration instead of fixed DeltaT steps. Posters registered with {'derivative': True}
+    # return the time derivative of their output (the continuous state); posters with a period are discrete and
+    # run only at their sample times, outputs held in between; every other poster is algebraic and is evaluated
+    # in dependency order at each stage. Integration steps never cross a sample time. Time is owned by the
+    # integrator, so no timer poster is needed, and DeltaT is unused.
+    continuous = True
+
+    def __init__(self, posters, channels, rtol=1e-6, atol=1e-6, hInit=1, hMax=np.inf, chunkSize=4096,
+                 historyPath=None):
+        super().__init__(posters, channels, chunkSize, historyPath)
+        self.rtol = rtol
+        self.atol = atol
+        self.h = hInit
+        self.hMax = hMax
+        allPosters = self.simulator.posters
+        self.derivatives = [P for P in allPosters if P.derivative]
+        self.sampled = [P for P in allPosters if P.multiRate]
+        self.algebraic = self.sortAlgebraic([P for P in allPosters if not P.derivative and not P.multiRate])
+        self.states = [P.outputs[0] for P in self.derivatives]
+        if any(len(P.outputs) != 1 for P in self.derivatives):
+            raise ValueError('derivative posters have exactly one output')
+        if any(P.divisor is not None for P in self.sampled):
+            raise ValueError('sampled posters need a period, steps have no fixed length')
+        self.steps = 0
+        self.rejected = 0
+        self.evaluations = 0
+
+    @staticmethod
+    def sortAlgebraic(posters):
+        # publishers before readers, algebraic loops cannot be evaluated in one pass
+        published = {id(ch): P for P in posters for ch in P.outputs}
+        for P in posters:
+            for ch in P.outputs:
+                for dC in getattr(ch, 'dataChannels', []):
+                    published[id(dC)] = P
+        order, state = [], {}
+
+        def visit(P):
+            if state.get(id(P)) == 'done':
+                return
+            if state.get(id(P)) == 'visiting':
+                raise ValueError('algebraic loop through {}'.format(P.name))
+            state[id(P)] = 'visiting'
+            for ch in P.inputs:
+                for dC in [ch] + getattr(ch, 'dataChannels', []):
+                    if id(dC) in published and published[id(dC)] is not P:
+                        visit(published[id(dC)])
+            state[id(P)] = 'done'
+            order.append(P)
+
+        for P in posters:
+            visit(P)
+        return order
+
+    def compile(self):
+        raise ValueError('AdaptiveSimulation steps through its own integrator')
+
+    def incremental(self, always=()):
+        raise ValueError('AdaptiveSimulation steps through its own integrator')
+
+    def rhs(self, t, y):
+        self.timeChannel.value = t
+        for ch, val in zip(self.states, y):
+            ch.value = val
+        for P in self.algebraic:
+            P.update()
+            P.post()
+        self.evaluations += 1
+        return np.array([P.system(*[inp.value for inp in P.inputs]) for P in self.derivatives], dtype=float)
+
+    def sample(self, t, y):
+        # discrete posters due at t see the algebraic values at (t, y), then the derivative is taken afresh
+        self.rhs(t, y)
+        due = [P for P in self.sampled if P.due(t)]
+        for P in due:
+            P.update()
+        for P in due:
+            P.post()
+        return self.rhs(t, y)
+
+    def nextSample(self):
+        # sampled posters that never ran are due immediately
+        return min((-np.inf if P.nextDue is None else P.nextDue for P in self.sampled), default=np.inf)
+
+    def runSim(self, T):
+        t = self.timeChannel.value
+        y = np.array([ch.value for ch in self.states], dtype=float)
+        k1 = self.sample(t, y) if t >= self.nextSample() else self.rhs(t, y)
+
+        h = self.h
+        while t < T:
+            tEnd = min(self.nextSample(), T)
+            h = min(h, self.hMax)
+            last = h >= tEnd - t
+            if last:
+                h = tEnd - t
+
+            k = [k1]
+            for s in range(1, 7):
+                k.append(self.rhs(t + C[s] * h, y + h * sum(a * ki for a, ki in zip(A[s], k))))
+            y5 = y + h * sum(a * ki for a, ki in zip(A[6], k))  # stage 7 was evaluated at (t + h, y5)
+            scale = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(y5))
+            err = np.sqrt(np.mean((h * np.dot(E, k) / scale) ** 2))
+
+            if err <= 1:
+                t = tEnd if last else t + h
+                y = y5
+                k1 = k[6]
+                if t >= self.nextSample():
+                    k1 = self.sample(t, y)
+                self.timeChannel.value = t
+                self.record()
+                self.steps += 1
+                hNext = h * min(5, max(.2, .9 * err ** -.2)) if err > 0 else 5 * h
+                self.h = h = max(hNext, self.h) if last else hNext  # a shortened last step says nothing new
+            else:
+                self.rejected += 1
+                h *= max(.2, .9 * err ** -.2)
+        self.history.flush()
@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import numpy as np
+from SaturationTable import CACHEDIR
+
+VERSION = 1  # bump when cached computations change meaning
+
+
+def _canonical(obj):
+    # JSON-able form of params, arrays reduced to dtype, shape and a digest of their bytes
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items())}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        arr = np.ascontiguousarray(obj)
+        return ['ndarray', arr.dtype.str, arr.shape, hashlib.sha256(arr.tobytes()).hexdigest()]
+    if isinstance(obj, (np.generic, float, int, bool)) or obj is None:
+        return repr(obj.item() if isinstance(obj, np.generic) else obj)
+    return str(obj)
+
+
+class AnalysisCache:
+    # Content-addressed .npz store for calibrations, steady-state maps and fits,
+    # least recently used entries are evicted once the directory exceeds maxBytes
+    def __init__(self, cacheDir=os.path.join(CACHEDIR, 'analysis'), maxBytes=256 * 2 ** 20):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, kind, params):
+        digest = hashlib.sha256(json.dumps([VERSION, kind, _canonical(params)]).encode()).hexdigest()
+        return '{}_{}'.format(kind, digest[:32])
+
+    def path(self, key): return os.path.join(self.cacheDir, key + '.npz')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                values = {name: data[name] for name in data.files}
+        except (OSError, ValueError):  # missing or partially written entry
+            return None
+        os.utime(path)  # mtime doubles as last use for eviction
+        return values
+
+    def put(self, key, values):
+        os.makedirs(self.cacheDir, exist_ok=True)
+        tmpFile = self.path(key) + '.{}.tmp.npz'.format(os.getpid())
+        np.savez(tmpFile, **values)
+        os.replace(tmpFile, self.path(key))
+        self.evict()
+
+    def memo(self, kind, params, compute):
+        # compute() returns a dict of arrays/scalars, cached under the hash of (kind, params)
+        key = self.key(kind, params)
+        values = self.get(key)
+        if values is None:
+            self.misses += 1
+            values = compute()
+            self.put(key, values)
+            values = {name: np.asarray(val) for name, val in values.items()}
+        else:
+            self.hits += 1
+        return values
+
+    def entries(self):
+        if not os.path.isdir(self.cacheDir):
+            return []
+        paths = [os.path.join(self.cacheDir, f) for f in os.listdir(self.cacheDir) if f.endswith('.npz')]
+        return [(p, os.stat(p)) for p in paths if os.path.exists(p)]
+
+    def size(self): return sum(st.st_size for _, st in self.entries())
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda e: e[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        for path, st in entries:
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= st.st_size
+
+    def invalidate(self, kind=None):
+        # drop every entry, or only those of one kind
+        for path, _ in self.entries():
+            if kind is None or os.path.basename(path).startswith(kind + '_'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+_default = None
+
+
+def defaultCache():
+    global _default
+    if _default is None:
+        _default = AnalysisCache()
+    return _default
@@ -6,7 +6,16 @@ import matplotlib.patches as mpatches
 import numpy as np
 from matplotlib import cm
 
+INFERNO = cm.inferno(range(256))
+
+
+def heatColor(x):
+    # inferno colour for x in [0, 1], clipped
+    return INFERNO[min(255, max(0, round(x * 255)))]
+
+
 class AnimChannel():
+    # draw(ax) creates the artists once, update(ax) only mutates the dynamic ones and returns them for blitting
     def __init__(self, channel, pos, size):
         self.channel = channel
         self.pos = pos
@@ -19,9 +28,12 @@ class AnimChannel():
                 [pos[0], pos[1] + size[1]],
             ])
 
-    def update(self, ax):
+    def draw(self, ax):
         raise NotImplementedError
 
+    def update(self, ax):
+        return []  # static by default
+
 
 class Animator():
     def __init__(self, animChannels: List[AnimChannel], sim, xBounds, yBounds):
@@ -32,24 +44,36 @@ class Animator():
         self.ax = ax
         self.xBounds = xBounds
         self.yBounds = yBounds
+        self.drawn = False
 
-    def animate(self, _):
-
-        self.sim.step()
-
-        self.ax.clear()
-
-        for aCh in self.animChannels:
+    def initFrame(self):
+        # all artists are created here, once; returns the dynamic ones
+        if not self.drawn:
             self.ax.set_xlim(self.xBounds)
             self.ax.set_ylim(self.yBounds)
-            aCh.update(self.ax)
+            for aCh in self.animChannels:
+                aCh.draw(self.ax)
+            self.drawn = True
+        return self.updateArtists()
+
+    def updateArtists(self):
+        artists = []
+        for aCh in self.animChannels:
+            artists += aCh.update(self.ax)
+        return artists
 
+    def animate(self, _):
+        self.sim.step()
+        if not self.drawn:
+            return self.initFrame()
+        return self.updateArtists()
 
     def runAnimation(self, interval, frames, fileName=None, fps=10):
-        ani = FuncAnimation(self.fig, self.animate, interval=interval, frames=frames)
+        ani = FuncAnimation(self.fig, self.animate, init_func=self.initFrame, interval=interval, frames=frames,
+                            blit=True)
 
         if fileName:
-            ani.save('animation.gif', writer='imagemagick', fps=fps)
+            ani.save(fileName, writer='pillow', fps=fps)
         plt.show()
 
 
@@ -63,7 +87,7 @@ class Compressor(AnimChannel):
         self.numCompressors = numCompressors
         self.cAdded = 0
 
-    def update(self, ax):
+    def draw(self, ax):
         ax.add_patch(mpatches.Polygon(self.coords, fill=False))
         ax.text(self.pos[0] + self.size[0], self.pos[1], '- - - 0%', fontsize=10, va='center', ha='left')
         ax.text(self.pos[0] + self.size[0], self.pos[1] + self.size[1], '- - - 100%', fontsize=10, va='center', ha='left')
@@ -103,12 +127,18 @@ class Compressors(AnimChannel):
 
         body.cAdded += 1
 
+    def draw(self, ax):
+        self.slide = ax.add_patch(mpatches.Polygon(self.slideCoords, fill=True))
+        self.outline = ax.add_patch(mpatches.Polygon(self.coords, fill=False, color='black'))
+
     def update(self, ax):
-        if self.channel.value != -1:
+        on = self.channel.value != -1
+        self.slide.set_visible(on)
+        if on:
             self.slideCoords[2][1] = self.body.pos[1] + self.channel.value * self.body.size[1] * 0.95
             self.slideCoords[3][1] = self.body.pos[1] + self.channel.value * self.body.size[1] * 0.95
-            ax.add_patch(mpatches.Polygon(self.slideCoords, fill=True))
-        ax.add_patch(mpatches.Polygon(self.coords, fill=False, color='black'))
+            self.slide.set_xy(self.slideCoords)
+        return [self.slide, self.outline]  # outline redrawn on top of the slide
 
 
 class Evaporator(AnimChannel):
@@ -117,7 +147,7 @@ class Evaporator(AnimChannel):
         self.numEvaporators = numEvaporators
         self.eAdded = 0
 
-    def update(self, ax):
+    def draw(self, ax):
         ax.add_patch(mpatches.Polygon(self.coords, fill=False))
 
         yBuffer = self.size[1] * 0.2
@@ -143,27 +173,35 @@ class Evaporators(AnimChannel):
 
         body.eAdded += 1
 
+    def draw(self, ax):
+        self.patch = ax.add_patch(mpatches.Polygon(self.coords, fill=bool(self.channel.value), edgecolor='black'))
+
     def update(self, ax):
-        ax.add_patch(mpatches.Polygon(self.coords, fill=self.channel.value, edgecolor='black'))
+        self.patch.set_fill(bool(self.channel.value))
+        return [self.patch]
 
 
 class Vessel(AnimChannel):
     def __init__(self, channel, pos, size):
         super().__init__(channel, pos, size)
 
-    def update(self, ax):
+    def draw(self, ax):
         ax.add_patch(mpatches.Polygon(self.coords, fill=False))
-        plt.text(self.pos[0] + self.size[0]/2, self.pos[1] + self.size[1] * .75, 'Vessel', fontsize=10, va='center', ha='center')
-        plt.text(self.pos[0] + self.size[0]/2, self.pos[1] + self.size[1] * .25, 'SP:' + str(round(self.channel.value, 3)), fontsize=10, va='center', ha='center')
+        ax.text(self.pos[0] + self.size[0]/2, self.pos[1] + self.size[1] * .75, 'Vessel', fontsize=10, va='center', ha='center')
+        self.label = ax.text(self.pos[0] + self.size[0]/2, self.pos[1] + self.size[1] * .25, '', fontsize=10, va='center', ha='center')
+
+    def update(self, ax):
+        self.label.set_text('SP:' + str(round(self.channel.value, 3)))
+        return [self.label]
 
 
 class Condenser(AnimChannel):
     def __init__(self, channel, pos, size):
         super().__init__(channel, pos, size)
 
-    def update(self, ax):
+    def draw(self, ax):
         ax.add_patch(mpatches.Polygon(self.coords, fill=False))
-        plt.text(self.pos[0] + self.size[0] * 0.5, self.pos[1] + self.size[1] * 0.5, 'Condenser', fontsize=10, va='center', ha='center')
+        ax.text(self.pos[0] + self.size[0] * 0.5, self.pos[1] + self.size[1] * 0.5, 'Condenser', fontsize=10, va='center', ha='center')
 
 
 class ExpansionValve(AnimChannel):
@@ -172,35 +210,45 @@ class ExpansionValve(AnimChannel):
         self.coords = np.insert(self.coords, 0, [[pos[0] + size[0] * 0.5, pos[1] + size[1] * 0.5]], axis=0)
         self.coords = np.insert(self.coords, 3, [[pos[0] + size[0] * 0.5, pos[1] + size[1] * 0.5]], axis=0)
 
-    def update(self, ax):
+    def draw(self, ax):
         ax.add_patch(mpatches.Polygon(self.coords, fill=True, color='black'))
-        plt.text(self.pos[0] + self.size[0], self.pos[1] + self.size[1] * 0.5, 'Expansion Valve', fontsize=10, va='center', ha='left')
+        ax.text(self.pos[0] + self.size[0], self.pos[1] + self.size[1] * 0.5, 'Expansion Valve', fontsize=10, va='center', ha='left')
 
 
 class HeatOut(AnimChannel):
+    scale = 0.00045  # use to normalize qin and qout, tweak internally
+
     def __init__(self, channel, pos):
         super().__init__(channel, pos, None)
 
-    def update(self, ax):
-        inferno_cm = (cm.inferno(range(256)))
-        scale = 0.00045  # use to normalize qin and qout, tweak internally
+    def draw(self, ax):
+        self.arrow = ax.arrow(self.pos[0], self.pos[1], 0, 0, shape='full', linewidth=3, head_width=.03)
+        self.label = ax.text(self.pos[0], self.pos[1], '  Q out', fontsize=10, va='center', ha='left')
 
-        ax.arrow(self.pos[0], self.pos[1], 0, self.channel.value * scale, shape='full', linewidth=3, head_width=.03,
-                 color=inferno_cm[round(self.channel.value * scale * 255)])
-        plt.text(self.pos[0], self.pos[1] + self.channel.value * scale * 0.5, '  Q out', fontsize=10, va='center', ha='left')
+    def update(self, ax):
+        length = self.channel.value * self.scale
+        self.arrow.set_data(x=self.pos[0], y=self.pos[1], dx=0, dy=length)
+        self.arrow.set_color(heatColor(length))
+        self.label.set_y(self.pos[1] + length * 0.5)
+        return [self.arrow, self.label]
 
 
 class HeatIn(AnimChannel):
+    scale = 0.001  # use to normalize qin and qout, tweak internally
+
     def __init__(self, channel, pos):
         super().__init__(channel, pos, None)
 
-    def update(self, ax):
-        inferno_cm = cm.inferno(range(256))
-        scale = 0.001  # use to normalize qin and qout, tweak internally
+    def draw(self, ax):
+        self.arrow = ax.arrow(self.pos[0], self.pos[1], 0, 0, shape='full', linewidth=3, head_width=.03, label='1')
+        self.label = ax.text(self.pos[0], self.pos[1], '  Q in', fontsize=10, va='center', ha='left')
 
-        ax.arrow(self.pos[0], self.pos[1] - self.channel.value * scale, 0, self.channel.value * scale, shape='full', linewidth=3, head_width=.03,
-             color=inferno_cm[round(self.channel.value * scale * 255)], label='1')
-        plt.text(self.pos[0], self.pos[1] - self.channel.value * scale * 0.5, '  Q in', fontsize=10, va='center', ha='left')
+    def update(self, ax):
+        length = self.channel.value * self.scale
+        self.arrow.set_data(x=self.pos[0], y=self.pos[1] - length, dx=0, dy=length)
+        self.arrow.set_color(heatColor(length))
+        self.label.set_y(self.pos[1] - length * 0.5)
+        return [self.arrow, self.label]
 
 
 class Power(AnimChannel):
@@ -210,18 +258,21 @@ class Power(AnimChannel):
         self.running_power = 0
         self.t = 0
 
+    def draw(self, ax):
+        ax.add_patch(mpatches.Polygon(self.coords, fill=False))
+        self.title = ax.text(self.pos[0] + self.size[0]/2, self.pos[1] + self.size[1] * .75, '', fontsize=10, va='center', ha='center')
+        self.label = ax.text(self.pos[0] + self.size[0]/2, self.pos[1] + self.size[1] * .25, '', fontsize=10, va='center', ha='center')
+
     def update(self, ax):
         self.running_power += self.channel.value
         self.t += 1
-        ax.add_patch(mpatches.Polygon(self.coords, fill=False))
-        plt.text(self.pos[0] + self.size[0]/2, self.pos[1] + self.size[1] * .75, 'Running power (t=' + str(self.t) + '):', fontsize=10, va='center', ha='center')
-        plt.text(self.pos[0] + self.size[0]/2, self.pos[1] + self.size[1] * .25, str(round(self.running_power, 2)), fontsize=10, va='center', ha='center')
-
-
-
+        self.title.set_text('Running power (t=' + str(self.t) + '):')
+        self.label.set_text(str(round(self.running_power, 2)))
+        return [self.title, self.label]
 
 
 class PathArrows(AnimChannel):
+    # static piping, drawn once
     def __init__(self, vessel, compressor, condenser, expansion, evaporator):
         super().__init__(None, None, None)
         self.vessel = vessel
@@ -230,7 +281,7 @@ class PathArrows(AnimChannel):
         self.expansion = expansion
         self.evaporator = evaporator
 
-    def update(self, ax):
+    def draw(self, ax):
         ax.arrow(self.vessel.pos[0] + self.vessel.size[0], self.vessel.pos[1] + self.vessel.size[1] * 0.5,
                  (self.compressor.pos[0] - (self.vessel.pos[0] + self.vessel.size[0])), 0, shape='full',
                  linewidth=1.2,
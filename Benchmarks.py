@@ -0,0 +1,298 @@
+import os
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+from contextlib import redirect_stdout
+import numpy as np
+
+# Fixed-input benchmarks of the hot paths. Each benchmark returns {name: (value, unit, higherIsBetter)};
+# timings are the median of `repeat` runs. Results are JSON, compare() reports ratios against a stored baseline.
+#   python Benchmarks.py --out bench.json [--baseline baseline.json] [--only sim,mpc] [--save-baseline]
+# --save-baseline writes benchmarkBaseline.json, later runs compare against it; baselines are per machine, the
+# committed one is a reference run described by its environment entry.
+#   python Benchmarks.py --check-startup  (exit status 1 when importing RefrigeratorSimulator is over budget)
+
+SEED = 0
+HORIZONS = (5, 10, 20, 40)  # MPCController T, build and solve
+MPCSTATES = [(30, -5, 0), (22, -5, 300), (20, -4.5, 500)]  # (SuctionPressure, RoomTemp, Qadded), all feasible
+LONGHORIZON = 10  # beyond this T only MPCSTATES[0] is solved, CBC takes minutes on the others
+GRIDS = (10, 25, 46)  # getPoints grid sizes (n x n)
+LARGEPLANT = (100, 200)  # compressors, evaporators
+DEFAULTBASELINE = 'benchmarkBaseline.json'
+STARTUPBUDGET = .5  # seconds to import RefrigeratorSimulator in a fresh interpreter, the import builds no tables
+LAZYMODULES = ('mip', 'scipy', 'sklearn', 'CoolProp')  # must not load with the feedback-only simulation
+
+
+def median(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return float(np.median(times))
+
+
+def freshSim(compiled=False, plant=None):
+    from RefrigeratorSimulator import makePosters, makeChannels, PLANT
+    from SystemEvents import TimedSimulation
+
+    np.random.seed(SEED)
+    plant = plant or PLANT
+    sim = TimedSimulation(makePosters(plant), makeChannels(plant))
+    if compiled:
+        sim.compile()
+    return sim
+
+
+def benchSimulation(repeat):
+    from RefrigeratorSimulator import toMin
+    from PlantTopology import PlantTopology
+
+    T = toMin(30)
+    results = {}
+    for plant, prefix in ((None, 'runSim'), (PlantTopology(*LARGEPLANT), 'runSim.plant{}x{}'.format(*LARGEPLANT))):
+        for compiled in (False, True):
+            steps = []
+
+            def run():
+                sim = freshSim(compiled, plant)
+                sim.runSim(T)
+                steps.append(len(sim.history) - 1)
+            elapsed = median(run, repeat)
+            results['{}.{}.stepsPerSecond'.format(prefix, 'compiled' if compiled else 'interpreted')] = (
+                steps[-1] / elapsed, 'steps/s', True)
+    return results
+
+
+def benchPropsSI(repeat):
+    # CoolProp calls per simulation step, for each saturation backend
+    import SaturationTable as ST
+    from RefrigeratorSimulator import toMin, SATBACKEND
+
+    results = {}
+    CP = ST.coolProp()
+    propsSI = CP.PropsSI
+    calls = [0]
+
+    def counted(*args):
+        calls[0] += 1
+        return propsSI(*args)
+    try:
+        CP.PropsSI = counted
+        for backend in ('exact', 'table'):
+            ST.setBackend(backend)
+            ST._exactScalar.cache_clear()
+            calls[0] = 0
+            sim = freshSim()
+            sim.runSim(toMin(3))
+            results['PropsSI.{}.callsPerStep'.format(backend)] = (calls[0] / (len(sim.history) - 1), 'calls/step', False)
+    finally:
+        CP.PropsSI = propsSI
+        ST.setBackend(SATBACKEND)
+    return results
+
+
+def benchEqSuction(repeat):
+    from RefrigeratorSimulator import eqSuction
+
+    rng = np.random.default_rng(SEED)
+    duties = rng.uniform(.1, 1, 10000).tolist()
+    qins = rng.uniform(1000, 8000, 10000).tolist()
+
+    def run():
+        for d, q in zip(duties, qins):
+            eqSuction(d, q)
+    return {'eqSuction.latency': (median(run, repeat) / len(duties) * 1e6, 'us/call', False)}
+
+
+def benchMPC(repeat):
+    from MPCController import MPCController
+    from RefrigeratorSimulator import optController, PLANT
+
+    slides = [1] * PLANT.compressors  # SlideValves argument, unused by the solve
+    MPCController(T=2)  # first build pays for loading CBC
+    results = {}
+    for T in HORIZONS:
+        results['MPCController.T{}.build'.format(T)] = (
+            median(lambda: MPCController(T=T), repeat) * 1e3, 'ms', False)
+    for T in HORIZONS:
+        states = MPCSTATES if T <= LONGHORIZON else MPCSTATES[:1]
+        solves = []
+        for _ in range(repeat):
+            ctrl = MPCController(T=T)
+            t = time.perf_counter()
+            for state in states:
+                ctrl(*state, slides)
+            solves.append((time.perf_counter() - t) / len(states))
+        results['MPCController.T{}.solve'.format(T)] = (float(np.median(solves)) * 1e3, 'ms', False)
+
+    def legacy():
+        for state in MPCSTATES:
+            optController(*state, slides)
+    results['optController.T10.solve'] = (median(legacy, repeat) / len(MPCSTATES) * 1e3, 'ms', False)
+    return results
+
+
+def benchGetPoints(repeat):
+    from staticThermAnalysis import getPoints, dutyGrid
+
+    results = {}
+    with redirect_stdout(io.StringIO()):
+        getPoints(dutyGrid(n=2), dutyGrid(n=2), backend='table', cache=None)  # loads scipy for the calibration
+    for n in GRIDS:
+        grid = dutyGrid(n=n)
+        with redirect_stdout(io.StringIO()):
+            elapsed = median(lambda: getPoints(grid, grid, backend='table', cache=None), repeat)
+        results['getPoints.{}x{}'.format(n, n)] = (elapsed * 1e3, 'ms', False)
+    return results
+
+
+def benchAnimation(repeat):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from AnimatorEvents import Animator
+    from AnimateRefrigerator import refrigeratorLayout
+
+    sim = freshSim()
+    animChannels, xBounds, yBounds = refrigeratorLayout(sim.simulator.getChannel)
+    animator = Animator(animChannels, sim, xBounds, yBounds)
+    canvas = animator.fig.canvas
+    animator.initFrame()
+    canvas.draw()
+    background = canvas.copy_from_bbox(animator.ax.bbox)
+    frames = 50
+
+    def blitted():
+        for i in range(frames):
+            canvas.restore_region(background)
+            for art in animator.animate(i):
+                animator.ax.draw_artist(art)
+            canvas.blit(animator.ax.bbox)
+
+    def full():
+        for i in range(frames):
+            animator.animate(i)
+            canvas.draw()
+    results = {'animate.blit.frame': (median(blitted, repeat) / frames * 1e3, 'ms', False),
+               'animate.full.frame': (median(full, repeat) / frames * 1e3, 'ms', False)}
+    plt.close(animator.fig)
+    return results
+
+
+def startupTime(module='RefrigeratorSimulator'):
+    # -> (seconds to import module in a fresh interpreter, the LAZYMODULES it loaded)
+    code = ('import sys, time, json; t = time.perf_counter(); import {}; t = time.perf_counter() - t; '
+            'print(json.dumps([t, [m for m in {!r} if m in sys.modules]]))').format(module, LAZYMODULES)
+    out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                         capture_output=True, text=True, check=True).stdout
+    return tuple(json.loads(out))
+
+
+def benchStartup(repeat):
+    startupTime()  # bytecode and OS file caches
+    return {'startup.RefrigeratorSimulator': (median(startupTime, repeat), 's', False)}
+
+
+def checkStartup(budget=STARTUPBUDGET, repeat=3):
+    # -> list of problems, empty when the import is within budget and leaves the heavy modules unloaded
+    startupTime()  # bytecode and OS file caches
+    runs = [startupTime() for _ in range(repeat)]
+    elapsed = float(np.median([t for t, _ in runs]))
+    problems = ['importing RefrigeratorSimulator took {:.3f} s, budget {:.3f} s'.format(elapsed, budget)] \
+        if elapsed > budget else []
+    loaded = sorted({m for _, mods in runs for m in mods})
+    if loaded:
+        problems.append('importing RefrigeratorSimulator loaded {}'.format(', '.join(loaded)))
+    return problems
+
+
+BENCHMARKS = {
+    'startup': benchStartup,
+    'sim': benchSimulation,
+    'propssi': benchPropsSI,
+    'eqsuction': benchEqSuction,
+    'mpc': benchMPC,
+    'getpoints': benchGetPoints,
+    'animation': benchAnimation,
+}
+
+
+def environment():
+    from SaturationTable import COOLPROPVERSION
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'coolprop': COOLPROPVERSION,
+            'machine': platform.machine(), 'system': platform.system(), 'cpus': os.cpu_count(), 'seed': SEED,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def runBenchmarks(only=None, repeat=3):
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if only is None or name in only:
+            for key, (value, unit, higherIsBetter) in bench(repeat).items():
+                results[key] = {'value': value, 'unit': unit, 'higherIsBetter': higherIsBetter}
+    return {'environment': environment(), 'repeat': repeat, 'results': results}
+
+
+def compare(report, baseline, tolerance=.1):
+    # -> rows (name, baseline, current, speedup) and the names slower than the baseline by more than tolerance;
+    # speedup > 1 is always an improvement, whichever direction the metric goes
+    rows, regressions = [], []
+    for name, cur in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None or not base['value'] or not cur['value']:
+            continue
+        speedup = cur['value'] / base['value'] if cur['higherIsBetter'] else base['value'] / cur['value']
+        rows.append((name, base['value'], cur['value'], speedup))
+        if speedup < 1 - tolerance:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('--out', help='write results JSON here')
+    parser.add_argument('--baseline', default=None, help='compare against this results JSON')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as ' + DEFAULTBASELINE)
+    parser.add_argument('--only', default=None, help='comma separated subset of ' + ','.join(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=.1, help='slowdown that counts as a regression')
+    parser.add_argument('--check-startup', action='store_true', help='only check the start-up time budget')
+    args = parser.parse_args(argv)
+
+    if args.check_startup:
+        problems = checkStartup(repeat=args.repeat)
+        print('\n'.join(problems) or 'start-up within {} s budget'.format(STARTUPBUDGET))
+        return 1 if problems else 0
+
+    report = runBenchmarks(args.only.split(',') if args.only else None, args.repeat)
+    for name, r in report['results'].items():
+        print('{:40s} {:12.4g} {}'.format(name, r['value'], r['unit']))
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=4)
+            f.write('\n')
+    if args.save_baseline:
+        with open(DEFAULTBASELINE, 'w') as f:
+            json.dump(report, f, indent=4)
+            f.write('\n')
+
+    baselinePath = args.baseline or (DEFAULTBASELINE if os.path.exists(DEFAULTBASELINE) and not args.save_baseline else None)
+    if baselinePath:
+        with open(baselinePath) as f:
+            rows, regressions = compare(report, json.load(f), args.tolerance)
+        print('\nvs {}:'.format(baselinePath))
+        for name, base, cur, speedup in rows:
+            print('{:40s} {:12.4g} -> {:12.4g}  x{:.2f}{}'.format(name, base, cur, speedup,
+                                                               '  REGRESSION' if name in regressions else ''))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+import sys
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from SystemEvents import SystemsHandler
+from Profiler import PosterStats
+
+# Soft real-time co-simulation: controller posters run against a live plant feed. The plant (or the stand-in
+# servePlant) sends one JSON object per line with measured channel values, e.g.
+#   {"Time": 120, "SuctionPressure": 20.4, "RoomTemp": -0.2, "Qadded": 3100}
+# and receives the output channels as they change, e.g. {"seq": 7, "SlideValves": [...], "EvaporatorsOn": [...]}.
+# Every poster is an asyncio task woken by new samples. Posters listed in `threaded` (slow solves such as
+# optController or MPCController) run in a worker thread, so sensor ingestion never waits for them; a busy
+# poster skips samples and acts on the latest one when it is free again. Until a poster finishes, or when it
+# raises or returns None, its outputs keep the last good command. Latency is measured from the arrival of the
+# sample a poster acted on to its post, a deadline miss is a latency above the poster's deadline (seconds).
+
+PORT = 8765
+INPUTS = ('Time', 'SuctionPressure', 'RoomTemp', 'Qadded')
+OUTPUTS = ('SlideValves', 'EvaporatorsOn')
+
+
+def jsonValue(value):
+    return np.asarray(value).tolist() if isinstance(value, (np.ndarray, list, tuple)) else float(value)
+
+
+class PosterTask:
+    def __init__(self, P, deadline, threaded, keep):
+        self.P = P
+        self.deadline = deadline
+        self.threaded = threaded
+        self.wake = None  # asyncio.Event, created by each run for its event loop
+        self.stamp = None  # arrival time of the newest sample not yet acted on
+        self.busy = False
+        self.runs = 0
+        self.held = 0  # samples that arrived while busy
+        self.misses = 0
+        self.failures = 0
+        self.latency = PosterStats(P.name, keep)
+        self.compute = PosterStats(P.name, keep)
+
+    def summary(self):
+        return {'runs': self.runs, 'held': self.held, 'misses': self.misses, 'failures': self.failures,
+                'deadline': self.deadline, 'latency': self.latency.summary(), 'compute': self.compute.summary()}
+
+
+class CoSimulation:
+    def __init__(self, posters, channels, inputs=INPUTS, outputs=OUTPUTS, deadline=1., deadlines=None,
+                 threaded=(), keep=65536):
+        self.simulator = sim = SystemsHandler()
+        for ch in channels:
+            sim.addChannel(ch)
+        for system in posters:
+            options = system[4] if len(system) > 4 else {}  # e.g. {'period': 30}, in plant Time units
+            sim.registerSystem(*system[:4], **options)
+
+        self.inputs = {name: sim.getChannel(name) for name in inputs if name in sim.channelMap}
+        self.outputs = [sim.getChannel(name) for name in outputs]
+        self.timeChannel = sim.channelMap.get('Time')
+        deadlines = deadlines or {}
+        self.tasks = [PosterTask(P, deadlines.get(P.name, deadline), P.name in threaded, keep) for P in sim.posters]
+        self.threads = max(len(threaded), 1)
+        self.pool = None  # ThreadPoolExecutor of the current run
+
+        self.samples = 0
+        self.commands = 0
+        self.lastSample = None
+        self.sampleInterval = PosterStats('sampleInterval', keep)
+        self.commandLatency = PosterStats('commandLatency', keep)  # sample arrival to command written
+        self.commandStamp = None
+        self.commandReady = None
+
+    ## Sensor side
+
+    def ingest(self, msg, now):
+        for name, val in msg.items():
+            if name in self.inputs:
+                self.inputs[name].value = val
+        if self.lastSample is not None:
+            self.sampleInterval.add(now - self.lastSample)
+        self.lastSample = now
+        self.samples += 1
+        for task in self.tasks:
+            if task.busy:
+                task.held += 1
+            task.stamp = now
+            task.wake.set()
+
+    async def readPlant(self, reader):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                line = await reader.readline()
+            except ConnectionError:  # plant closed with commands still unread
+                return
+            if not line:
+                return
+            self.ingest(json.loads(line), loop.time())
+
+    ## Posters
+
+    async def runPoster(self, task):
+        loop = asyncio.get_running_loop()
+        P = task.P
+        while True:
+            await task.wake.wait()
+            task.wake.clear()
+            stamp = task.stamp
+            if P.multiRate and not P.due(self.timeChannel.value if self.timeChannel is not None else None):
+                continue
+
+            task.busy = True
+            start = loop.time()
+            try:
+                if task.threaded:  # inputs copied, the reader keeps writing channels during the solve
+                    args = [np.array(inp.value) if isinstance(inp.value, np.ndarray) else inp.value
+                            for inp in P.inputs]
+                    state = await loop.run_in_executor(self.pool, P.system, *args)
+                else:
+                    state = P.system(*[inp.value for inp in P.inputs])
+            except Exception as e:
+                print('{} failed, holding its last command: {!r}'.format(P.name, e), file=sys.stderr)
+                state = None
+                task.failures += 1
+            finally:
+                task.busy = False
+
+            done = loop.time()
+            task.compute.add(done - start)
+            if state is None:
+                continue
+            P.state = [state] if len(P.outputs) == 1 else list(state)
+            P.post()
+            task.runs += 1
+            task.latency.add(done - stamp)
+            if done - stamp > task.deadline:
+                task.misses += 1
+            if any(ch in self.outputs for ch in P.outputs):
+                self.commandStamp = stamp if self.commandStamp is None else min(self.commandStamp, stamp)
+                self.commandReady.set()
+
+    ## Actuator side
+
+    async def writeCommands(self, writer):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.commandReady.wait()
+            self.commandReady.clear()
+            msg = {'seq': self.commands}
+            msg.update((ch.name, jsonValue(ch.value)) for ch in self.outputs)
+            writer.write((json.dumps(msg) + '\n').encode())
+            await writer.drain()
+            self.commandLatency.add(loop.time() - self.commandStamp)
+            self.commandStamp = None
+            self.commands += 1
+
+    async def run(self, host='127.0.0.1', port=PORT, duration=None):
+        # until the plant closes the connection or `duration` seconds pass, -> report(). An instance can run
+        # again, counters and statistics keep accumulating
+        reader, writer = await asyncio.open_connection(host, port)
+        self.pool = ThreadPoolExecutor(self.threads, thread_name_prefix='poster')
+        self.commandReady = asyncio.Event()
+        self.commandStamp = self.lastSample = None
+        for task in self.tasks:
+            task.wake = asyncio.Event()
+            task.busy = False
+        workers = [asyncio.create_task(self.runPoster(task)) for task in self.tasks]
+        workers.append(asyncio.create_task(self.writeCommands(writer)))
+        try:
+            await asyncio.wait_for(self.readPlant(reader), duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            writer.close()
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        return self.report()
+
+    def report(self):
+        return {'samples': self.samples, 'commands': self.commands, 'sampleInterval': self.sampleInterval.summary(),
+                'commandLatency': self.commandLatency.summary(),
+                'posters': {task.P.name: task.summary() for task in self.tasks}}
+
+
+## Stand-in plant
+
+async def servePlant(host='127.0.0.1', port=PORT, interval=.1, steps=None, posters=None, makeChannels=None):
+    # the RefrigeratorSimulator plant without its controllers, one step and one sample every `interval`
+    # seconds, commands are applied when they arrive
+    import RefrigeratorSimulator as R
+    from SystemEvents import TimedSimulation
+
+    posters = posters or [P for P in R.posters if P[2][0] not in OUTPUTS]
+    makeChannels = makeChannels or R.makeChannels
+    done = asyncio.get_running_loop().create_future()
+
+    async def applyCommands(reader, chDict):
+        while line := await reader.readline():
+            for name, val in json.loads(line).items():
+                if name in OUTPUTS:
+                    chDict[name].value = val
+
+    async def session(reader, writer):
+        sim = TimedSimulation(posters, makeChannels())
+        chDict = sim.simulator.channelMap
+        commands = asyncio.create_task(applyCommands(reader, chDict))
+        loop = asyncio.get_running_loop()
+        due = loop.time()
+        try:
+            n = 0
+            while steps is None or n < steps:
+                sim.step()
+                writer.write((json.dumps({name: jsonValue(chDict[name].value) for name in INPUTS}) + '\n').encode())
+                await writer.drain()
+                n += 1
+                due += interval  # fixed rate, no drift from the step time
+                await asyncio.sleep(max(due - loop.time(), 0))
+        except ConnectionError:
+            pass
+        finally:
+            commands.cancel()
+            writer.close()
+            if not done.done():
+                done.set_result(sim)
+
+    server = await asyncio.start_server(session, host, port)
+    async with server:
+        return await done  # the first session's simulation, once it ends
+
+
+def slowed(system, seconds):
+    # stand-in for a slow solve, blocks its thread for `seconds`
+    def slow(*args):
+        time.sleep(seconds)
+        return system(*args)
+    return slow
+
+
+async def demo(interval=.05, steps=200, slowdown=0):
+    # stand-in plant and feedback controllers in one event loop, slowdown > 0 runs the slide valve controller in
+    # a worker thread taking that many seconds per call. MPCController has no demo: its evaporator model
+    # (at most 5 x 6.5 x 30 kW) cannot cover the stand-in plant's 2000 to 4500 kW load, every solve is infeasible
+    import RefrigeratorSimulator as R
+
+    controllers = [P for P in R.posters if P[2][0] in OUTPUTS]
+    threaded = ()
+    if slowdown:
+        controllers = [[*P[:3], slowed(P[3], slowdown)] if P[0] == 'SlideValveSys' else P for P in controllers]
+        threaded = ('SlideValveSys',)
+    cosim = CoSimulation(controllers, R.makeChannels(), deadline=interval, threaded=threaded)
+
+    plant = asyncio.create_task(servePlant(interval=interval, steps=steps))
+    await asyncio.sleep(.1)  # server listening
+    report = await cosim.run()
+    sim = await plant
+    return report, sim
+
+
+if __name__ == '__main__':
+    #   python CoSimulation.py plant [interval]      stand-in plant on PORT
+    #   python CoSimulation.py run [host] [port]     feedback controllers against a plant until it disconnects
+    #   python CoSimulation.py [--slow seconds]      both in one process
+    if len(sys.argv) > 1 and sys.argv[1] == 'plant':
+        asyncio.run(servePlant(interval=float(sys.argv[2]) if len(sys.argv) > 2 else .1))
+    elif len(sys.argv) > 1 and sys.argv[1] == 'run':
+        import RefrigeratorSimulator as R
+
+        cosim = CoSimulation([P for P in R.posters if P[2][0] in OUTPUTS], R.makeChannels())
+        host, port = (sys.argv[2:] + ['127.0.0.1', PORT])[:2]
+        print(json.dumps(asyncio.run(cosim.run(host, int(port))), indent=4))
+    else:
+        slowdown = float(sys.argv[sys.argv.index('--slow') + 1]) if '--slow' in sys.argv else 0
+        report, sim = asyncio.run(demo(slowdown=slowdown))
+        print(json.dumps(report, indent=4))
+        print('RoomTemp at the end: {:.3f} C'.format(sim.getChVal('RoomTemp')[-1]))
@@ -0,0 +1,62 @@
+import numpy as np
+
+# Shape-preserving downsampling of long (time, value) series for plotting, both return index arrays into the
+# input so callers can slice any number of aligned columns. x must be increasing.
+
+
+def minMaxIndices(y, nOut):
+    # min and max of each of nOut // 2 equal bins, in index order: keeps every spike visible
+    n = len(y)
+    if n <= nOut:
+        return np.arange(n)
+    size = -(-n // max(nOut // 2, 1))
+    m = n // size * size
+    blocks = np.asarray(y[:m]).reshape(-1, size)
+    offsets = np.arange(0, m, size)
+    idx = [offsets + np.argmin(blocks, axis=1), offsets + np.argmax(blocks, axis=1)]
+    if m < n:  # partial last bin
+        tail = np.asarray(y[m:])
+        idx.append(np.array([m + np.argmin(tail), m + np.argmax(tail)]))
+    return np.unique(np.concatenate(idx + [np.array([0, n - 1])]))
+
+
+def lttbIndices(x, y, nOut):
+    # Largest-Triangle-Three-Buckets: per bucket the point spanning the largest triangle with the previously
+    # kept point and the mean of the next bucket
+    n = len(y)
+    if n <= nOut or nOut < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, nOut - 1).astype(int)
+    idx = np.empty(nOut, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for b in range(nOut - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nextLo, nextHi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        cx, cy = x[nextLo:nextHi].mean(), y[nextLo:nextHi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[b + 1] = a
+    return idx
+
+
+def downsample(x, y, nOut, method='minmax'):
+    # -> (x, y) with about nOut points, method is 'minmax', 'lttb' or None (no downsampling)
+    if method is None:
+        return np.asarray(x), np.asarray(y)
+    if method == 'minmax':
+        idx = minMaxIndices(y, nOut)
+    elif method == 'lttb':
+        idx = lttbIndices(x, y, nOut)
+    else:
+        raise ValueError('Unknown downsampling method {}, expected minmax, lttb or None'.format(method))
+    return np.asarray(x)[idx], np.asarray(y)[idx]
+
+
+def visibleSlice(x, lo, hi):
+    # index range covering [lo, hi] plus one point either side, so lines run to the axes edge
+    i0 = max(int(np.searchsorted(x, lo, side='left')) - 1, 0)
+    i1 = min(int(np.searchsorted(x, hi, side='right')) + 1, len(x))
+    return slice(i0, i1)
@@ -0,0 +1,141 @@
+from SystemEvents import *
+import numpy as np
+from SaturationTable import satT, satD
+from RefrigeratorSimulator import toMin, euler, timer, spFit, setRoomTemp, setTotalQin, setTotalQout, setTotalEnergy
+from RefrigeratorSimulator import makeChannels
+from PlantTopology import PLANT
+
+# Batched plant: every channel except Time and DeltaT holds an (N,) array, one entry per scenario,
+# and all scenarios advance together. setRoomTemp, setTotalQin, setTotalQout, setTotalEnergy and timer
+# are elementwise already and are reused from RefrigeratorSimulator.
+
+
+### CHANNELS
+
+SHARED = ('Time', 'DeltaT')  # lockstep clock, scalars
+
+# scenario parameters on top of the RefrigeratorSimulator channels
+PARAMETERS = {
+	'QaddedBase': 4000,  # kW, Qadded = base - amp * cos^4 + noise * U[0, 1)
+	'QaddedAmp': 2000,  # kW
+	'QaddedNoise': 500,  # kW
+	'EvapGain': PLANT.evaporators,  # evaporators on per degree above -0.5 C, ensembleChannels uses plant.evaporators
+	'SlideSPLow': 10,  # psia, suction pressure at zero compressor duty
+	'SlideSPHigh': 30,  # psia, suction pressure at full compressor duty
+}
+
+
+def ensembleChannels(N, plant=PLANT, **overrides):
+	# fresh channels with every scenario at the RefrigeratorSimulator initial values, overrides are scalars or (N,)
+	def value(name, default):
+		val = overrides.get(name, default)
+		return val if name in SHARED else np.broadcast_to(np.asarray(val, dtype=float), (N,)).copy()
+
+	defaults = dict(PARAMETERS, EvapGain=plant.evaporators)  # like RefrigeratorSimulator.makeFeedbackEvaporatorOn
+	channels = makeChannels(plant)
+	for ch in channels:
+		if type(ch) is not GroupChannel:
+			ch.value = value(ch.name, ch.value)
+	return channels + [DataChannel(name, value(name, default)) for name, default in defaults.items()]
+
+
+## Helper Functions
+
+def CompressorDuty(SlideValves):
+	slides = np.asarray(SlideValves)  # (compressors, N)
+	on = slides > 0
+	return (np.where(on, slides, 0).sum(axis=0) * .9 + on.sum(axis=0) * .1) / len(slides)
+
+
+### Systems
+
+def makeSetQadded(noise):
+	# noise(N) returns N samples of U[0, 1), e.g. Generator.random
+	def setQadded(Time, QaddedBase, QaddedAmp, QaddedNoise):
+		return QaddedBase - QaddedAmp * np.cos(2 * np.pi * Time / toMin(2)) ** 4 + QaddedNoise * noise(len(QaddedBase))
+	return setQadded
+
+
+def setTotalMassHighFlow(SuctionPressure, SlideValves):
+	return satD(SuctionPressure) * CompressorDuty(SlideValves)
+
+
+def setTotalCompressorPower(SlideValves, SuctionPressure):
+	ONPOWER = 600
+	SLIDEPOWER = 1000
+	SPSET = 18
+	GAIN = .02
+
+	slides = np.asarray(SlideValves)
+	on = slides > 0
+	power = np.where(on, slides, 0).sum(axis=0) * SLIDEPOWER + on.sum(axis=0) * ONPOWER
+	SPdiff = satT(SPSET) - satT(SuctionPressure)
+	perc = 1 - SPdiff * GAIN
+	return perc * power
+
+
+def setSuctionPressure(SuctionPressure, SlideValves, TotalQin, DeltaT):
+	DECAY = .003
+	eqSP = spFit(CompressorDuty(SlideValves), TotalQin)
+	spDot = DECAY * (eqSP - SuctionPressure)
+	return euler(SuctionPressure, spDot, DeltaT)
+
+
+## Feedback Controllers
+
+def makeFeedbackSlideValves(plant=PLANT):
+	# RefrigeratorSimulator.makeFeedbackSlideValves with the duty per scenario, returns (compressors, N)
+	on, span, gain = .1 * plant.stageDuty, .9 * plant.stageDuty, .4 * plant.stageDuty
+	steps = np.tile([-span, -on], plant.compressors - 1)[:, None]
+
+	def feedbackSlideValves(SuctionPressure, SlideSPLow, SlideSPHigh):
+		duty = np.clip((SuctionPressure - SlideSPLow) / (SlideSPHigh - SlideSPLow), 0, 1)
+		left = np.cumsum(np.concatenate((duty[None], np.broadcast_to(steps, (len(steps), len(duty))))), axis=0)[::2]
+		return np.where(left > on, np.minimum(1, (left - on) / gain), -1)
+	return feedbackSlideValves
+
+
+def makeFeedbackEvaporatorOn(plant=PLANT):
+	slots = np.arange(plant.evaporators)[:, None]
+
+	def feedbackEvaporatorOn(RoomTemp, EvapGain):
+		N = np.where(RoomTemp < -.5, 0, EvapGain * (RoomTemp + .5))
+		return (slots < N).astype(float)  # (evaporators, N)
+	return feedbackEvaporatorOn
+
+
+## Configure Systems
+
+def ensemblePosters(seed=None, plant=PLANT, noise=None):
+	# noise: load noise source as in makeSetQadded, default a Generator seeded with seed
+	if noise is None:
+		noise = np.random.default_rng(seed).random
+	return [
+		['timer', ['Time', 'DeltaT'], ['Time'], timer],
+		['QaddedSys', ['Time', 'QaddedBase', 'QaddedAmp', 'QaddedNoise'], ['Qadded'], makeSetQadded(noise)],
+		func2Poster('RoomTemp', setRoomTemp),
+		func2Poster('TotalMassHighFlow', setTotalMassHighFlow),
+		func2Poster('TotalQin', setTotalQin),
+		func2Poster('TotalQout', setTotalQout),
+		func2Poster('TotalCompressorPower', setTotalCompressorPower),
+		func2Poster('TotalEnergy', setTotalEnergy),
+		func2Poster('SuctionPressure', setSuctionPressure),
+		['SlideValveSys', ['SuctionPressure', 'SlideSPLow', 'SlideSPHigh'], ['SlideValves'], makeFeedbackSlideValves(plant)],
+		['EvaporatorSys', ['RoomTemp', 'EvapGain'], ['EvaporatorsOn'], makeFeedbackEvaporatorOn(plant)]
+	]
+
+
+def ensembleSimulation(N, seed=None, chunkSize=4096, plant=PLANT, **overrides):
+	# TimedSimulation whose history columns are (steps, N)
+	sim = TimedSimulation(ensemblePosters(seed, plant), ensembleChannels(N, plant, **overrides), chunkSize, width=N)
+	sim.compile()
+	return sim
+
+
+if __name__ == '__main__':
+	N = 1000
+	rng = np.random.default_rng(0)
+	ensSim = ensembleSimulation(N, seed=1, AmbientTemp=rng.uniform(10, 35, N), RoomTemp=rng.uniform(-1, 1, N))
+	ensSim.runSim(toMin(3))
+	energy = ensSim.getChVal('TotalEnergy')[-1]
+	print('TotalEnergy after 3 days: mean {:.0f} kWh, min {:.0f}, max {:.0f}'.format(energy.mean(), energy.min(), energy.max()))
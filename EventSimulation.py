@@ -0,0 +1,137 @@
+import numpy as np
+from SystemEvents import TimedSimulation, rowGetter
+
+
+class EventSimulation(TimedSimulation):
+    # Fixed-step simulation that skips ahead while the trajectory is locally linear. rtol/atol are a budget for
+    # the deviation from the fixed-step run over one runSim call, per channel atol + rtol |v|: a jump over n
+    # of the run's N steps may use n/N of it, so along a jump the step increment d may change by at most
+    # tol = 2 (atol + rtol |v|) / N per step (a linear fill deviates by n/2 times that change). The jump length
+    # n keeps the predicted curvature inside tol and is verified by stepping from the predicted state at the
+    # midpoint and at the end; a threshold crossing or load change shows up as a different increment and
+    # halves the jump. errorEstimate sums the verified deviation of every jump per recorded channel and stays
+    # within the budget. Where the posters are smooth the history follows the fixed-step run within it, but a
+    # threshold poster (the feedback controllers) that the drifted state reaches a step earlier or later
+    # switches at that step, and its outputs and everything downstream differ until the runs meet again.
+    # Skipped rows are filled in linearly, so the history stays on the fixed-step grid. Rejected jumps restore
+    # the state and the global np.random state, so a run that never jumps (e.g. with per-step noise) matches
+    # the fixed-step run exactly.
+    def __init__(self, posters, channels, rtol=1e-6, atol=1e-9, minJump=8, maxJump=4096, chunkSize=4096, historyPath=None):
+        super().__init__(posters, channels, chunkSize, historyPath)
+        if self.multiRate:
+            raise ValueError('multi-rate posters count steps, EventSimulation cannot skip them')
+        if self.simulator.channelMap['DeltaT'].publishers:
+            raise ValueError('EventSimulation needs a constant DeltaT')
+        self.rtol = rtol
+        self.atol = atol
+        self.minJump = minJump  # shorter jumps cost more in probes than they save
+        self.maxJump = maxJump
+        self.compile()
+        self.steps = 0
+        self.jumps = 0
+        self.skipped = 0
+        self.probes = 0  # verification steps of rejected jumps
+        self.errorEstimate = np.zeros(len(self.recorded))
+
+    def profile(self, enabled=True):
+        raise ValueError('EventSimulation steps through its own loop, the profiler would count no steps')
+
+    def compile(self):
+        plan = super().compile()
+        self.recordSlots = np.array([plan.slot(ch) for ch in self.recorded])
+        return plan
+
+    def runSim(self, T):
+        plan = self.plan
+        plan.load()
+        vals = plan.vals
+        timeSlot = plan.slot(self.timeChannel)
+        dT = self.simulator.channelMap['DeltaT'].value
+        total = max(int(np.ceil((T - vals[timeSlot]) / dT - 1e-9)), 1)  # N, steps of this run
+
+        stepFunc, due, append, recordSlots = plan.stepFunc, plan.due, self.history.append, self.recordSlots
+        recordVals = rowGetter(recordSlots.tolist())
+        rtol, atol = self.rtol, self.atol
+        v0, v1 = np.array(vals, dtype=float), np.empty(len(vals))  # buffers reused for every step
+        d, prevD = np.empty(len(vals)), np.empty(len(vals))
+        seen = 1  # consecutive states known: v0, then d, then prevD
+        wait, backoff = 0, 0  # steps until the next jump attempt after failures, doubled on each failure
+        while vals[timeSlot] < T:
+            stepFunc(vals, due)
+            self.steps += 1
+            wait -= 1
+            if wait > 2:  # no jump attempt for a while, record like runPlan
+                append(recordVals(vals))
+                seen = 0
+                continue
+
+            v1[:] = vals
+            append(v1[recordSlots])
+            if seen:
+                np.subtract(v1, v0, out=d)
+            if seen > 1 and wait <= 0:
+                d2 = np.abs(d - prevD)
+                tol = 2 * (atol + rtol * np.abs(v1)) / total
+                if (d2 <= tol).all():
+                    remaining = int(np.ceil((T - vals[timeSlot]) / dT - 1e-9)) - 1
+                    n = min(int(np.min(tol / np.maximum(d2, 1e-300))), self.maxJump, remaining)
+                    if n >= self.minJump:
+                        if self.jump(v1, d, n, tol):
+                            v1[:] = vals
+                            backoff = 0
+                        else:
+                            backoff = wait = min(2 * backoff or 1, 64)
+            d, prevD = prevD, d
+            v0, v1 = v1, v0
+            seen += 1
+        plan.store()
+        self.history.flush()
+
+    def jump(self, v, d, n, tol):
+        # try to skip ahead up to n steps: the midpoint is checked first, a failure there halves n,
+        # a failure only at the end falls back to the verified midpoint
+        rngState = np.random.get_state()  # a rejected jump leaves the global RNG as it was
+        while n >= 2:
+            m = n // 2
+            midDev = self.probe(v, d, m, tol)
+            if midDev is None:
+                self.probes += 1
+                n = m
+                continue
+            if m < 2:
+                midVals = None
+            else:
+                midVals = list(self.plan.vals)
+            endDev = self.probe(v, d, n, tol)
+            if endDev is not None:
+                self.commit(v, d, n, endDev)
+                return True
+            self.probes += 1
+            if midVals is not None:
+                self.plan.vals[:] = midVals
+                self.commit(v, d, m, midDev)
+                return True
+            break
+        self.plan.vals[:] = v.tolist()
+        np.random.set_state(rngState)
+        return False
+
+    def probe(self, v, d, m, tol):
+        # step once from the extrapolated state v + m d, -> the change of the increment, None beyond tol
+        vals = self.plan.vals
+        start = v + m * d
+        vals[:] = start.tolist()
+        self.plan.step()
+        dev = np.abs(np.array(vals, dtype=float) - start - d)
+        return None if np.any(dev > tol) else dev
+
+    def commit(self, v, d, m, dev):
+        # rows 1..m are extrapolated, row m + 1 is the probe step already in plan.vals
+        slots = self.recordSlots
+        fill = v[slots] + np.arange(1, m + 1)[:, None] * d[slots]
+        self.history.extend(fill)
+        self.history.append(np.array(self.plan.vals, dtype=float)[slots])
+        self.errorEstimate += m / 2 * dev[slots]
+        self.jumps += 1
+        self.skipped += m - 1
+        self.steps += 1
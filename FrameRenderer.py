@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from SystemEvents import DataChannel
+from HistoryStore import StreamingHistory
+
+# Headless rendering of a recorded history: frames are drawn in worker processes with the Agg backend from a
+# layout(getCh) -> (animChannels, xBounds, yBounds) function such as AnimateRefrigerator.refrigeratorLayout,
+# then assembled into a GIF (Pillow) or a video (ffmpeg). The layout must be a module-level function so it
+# can be sent to the workers. AnimChannels that accumulate across updates (Power) only see rendered frames.
+
+
+class HistoryReplay:
+    # stand-in channels set from one history row at a time
+    def __init__(self, channelNames, rows):
+        self.channelNames = list(channelNames)
+        self.channels = [DataChannel(name, 0.) for name in self.channelNames]
+        self.channelMap = {ch.name: ch for ch in self.channels}
+        self.rows = rows  # (frames, channels), may be a memmap-backed view
+
+    def getChannel(self, name): return self.channelMap[name]
+
+    def seek(self, i):
+        for ch, val in zip(self.channels, self.rows[i].tolist()):
+            ch.value = val
+
+
+def historyRows(source, start=0, stop=None, every=1):
+    # channel names and the decimated (frames, channels) rows of a TimedSimulation, history or stream directory
+    history = getattr(source, 'history', source)
+    if isinstance(history, str):
+        history = StreamingHistory.open(history)
+    return history.channelNames, np.column_stack([history.column(name)[start:stop:every]
+                                                  for name in history.channelNames])
+
+
+## Workers
+
+_worker = {}
+
+
+def _initWorker(layout, channelNames, rows, dpi):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    replay = HistoryReplay(channelNames, rows)
+    animChannels, xBounds, yBounds = layout(replay.getChannel)
+    fig, ax = plt.subplots(dpi=dpi)
+    ax.set_xlim(xBounds)
+    ax.set_ylim(yBounds)
+    for aCh in animChannels:
+        aCh.draw(ax)
+    replay.seek(0)
+    artists = [art for aCh in animChannels for art in aCh.update(ax)]
+    for art in artists:  # dynamic artists stay out of the cached background
+        art.set_animated(True)
+    fig.canvas.draw()
+    _worker.update(replay=replay, animChannels=animChannels, fig=fig, ax=ax,
+                   background=fig.canvas.copy_from_bbox(fig.bbox))
+
+
+def _renderShard(job):
+    from PIL import Image
+
+    frames, outDir = job
+    w = _worker
+    canvas, ax = w['fig'].canvas, w['ax']
+    paths = []
+    for i in frames:
+        w['replay'].seek(i)
+        canvas.restore_region(w['background'])
+        for aCh in w['animChannels']:
+            for art in aCh.update(ax):
+                ax.draw_artist(art)
+        path = os.path.join(outDir, 'frame_{:06d}.png'.format(i))
+        Image.fromarray(np.asarray(canvas.buffer_rgba())[..., :3]).save(path, compress_level=1)
+        paths.append(path)
+    return paths
+
+
+def renderFrames(source, layout, outDir, start=0, stop=None, every=1, workers=None, dpi=100):
+    # one PNG per kept history row, rendered in contiguous shards (static background drawn once per worker)
+    channelNames, rows = historyRows(source, start, stop, every)
+    os.makedirs(outDir, exist_ok=True)
+    workers = workers or os.cpu_count()
+    shards = [(sh.tolist(), outDir) for sh in np.array_split(np.arange(len(rows)), workers) if len(sh)]
+    with ProcessPoolExecutor(workers, initializer=_initWorker, initargs=(layout, channelNames, rows, dpi)) as pool:
+        return [path for paths in pool.map(_renderShard, shards) for path in paths]
+
+
+def assemble(framePaths, fileName, fps=10):
+    # .gif through Pillow, anything else (.mp4, .webm, ...) through ffmpeg
+    if fileName.endswith('.gif'):
+        from PIL import Image
+
+        first = Image.open(framePaths[0]).quantize()
+        rest = (Image.open(path).quantize() for path in framePaths[1:])
+        first.save(fileName, save_all=True, append_images=rest, duration=round(1000 / fps), loop=0)
+        return fileName
+
+    if shutil.which('ffmpeg') is None:
+        raise RuntimeError('ffmpeg is needed to write {}, or use a .gif file name'.format(fileName))
+    pattern = os.path.join(os.path.dirname(framePaths[0]), 'frame_%06d.png')
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-framerate', str(fps), '-i', pattern,
+                    '-pix_fmt', 'yuv420p', fileName], check=True)
+    return fileName
+
+
+def renderAnimation(source, layout, fileName, fps=10, start=0, stop=None, every=1, workers=None, dpi=100,
+                    frameDir=None):
+    # frames go to a temporary directory unless frameDir is given, which is then kept
+    outDir = frameDir or tempfile.mkdtemp(prefix='frames_')
+    try:
+        frames = renderFrames(source, layout, outDir, start, stop, every, workers, dpi)
+        return assemble(frames, fileName, fps)
+    finally:
+        if frameDir is None:
+            shutil.rmtree(outDir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    import time
+    from RefrigeratorSimulator import posters, makeChannels, toMin
+    from SystemEvents import TimedSimulation
+    from AnimateRefrigerator import refrigeratorLayout
+
+    sim = TimedSimulation(posters, makeChannels())
+    sim.compile()
+    sim.runSim(toMin(3))
+    t = time.perf_counter()
+    renderAnimation(sim, refrigeratorLayout, 'history.gif', every=4)
+    print('rendered {} frames in {:.1f} s'.format(-(-len(sim.history) // 4), time.perf_counter() - t))
@@ -0,0 +1,187 @@
+import os
+import json
+import numpy as np
+
+
+class ColumnHistory:
+    # Channel-major float storage: data[channel, step], grown in whole chunks so columns stay contiguous.
+    # With width=N (ensembles) every step holds N values per channel: data[channel, step, scenario].
+    def __init__(self, channelNames, chunkSize=4096, width=None):
+        self.channelNames = list(channelNames)
+        self.index = {name: i for i, name in enumerate(self.channelNames)}
+        self.chunkSize = chunkSize
+        self.width = width
+        self.rowShape = (len(self.channelNames),) + (() if width is None else (width,))
+        self.data = np.empty(self.rowShape[:1] + (chunkSize,) + self.rowShape[1:])
+        self.n = 0
+
+    def __len__(self): return self.n
+
+    def __getitem__(self, i):
+        return self.toArray()[i].tolist()
+
+    @property
+    def capacity(self): return self.data.shape[1]
+
+    def reserve(self, nSteps):
+        # make room for nSteps more rows without further reallocation
+        need = self.n + nSteps
+        if need > self.capacity:
+            self.resize(-(-need // self.chunkSize) * self.chunkSize)
+
+    def resize(self, capacity):
+        data = np.empty(self.rowShape[:1] + (capacity,) + self.rowShape[1:])
+        data[:, :self.n] = self.data[:, :self.n]
+        self.data = data
+
+    def append(self, row):
+        if self.n == self.capacity:
+            self.resize(self.capacity + max(self.chunkSize, self.capacity // 2 // self.chunkSize * self.chunkSize))
+        if self.width is None:
+            self.data[:, self.n] = row
+        else:  # mix of scalars and (N,) arrays, scalars broadcast
+            for i, val in enumerate(row):
+                self.data[i, self.n] = val
+        self.n += 1
+
+    def extend(self, block):
+        # bulk append of a (steps, channels) array
+        block = np.asarray(block, dtype=float)
+        self.reserve(len(block))
+        self.data[:, self.n:self.n + len(block)] = np.swapaxes(block, 0, 1)
+        self.n += len(block)
+
+    def flush(self):
+        pass  # in-memory, see StreamingHistory
+
+    def close(self):
+        pass
+
+    def column(self, name):
+        # zero-copy view, (steps,) or (steps, N), only valid until the next reallocation
+        return self.data[self.index[name], :self.n]
+
+    def last(self, name): return self.data[self.index[name], self.n - 1]
+
+    def toArray(self):
+        # (steps, channels) or (steps, channels, N) view in channelNames order
+        return self.data[:, :self.n].swapaxes(0, 1)
+
+    def toRecords(self):
+        return np.rec.fromarrays([self.column(name) for name in self.channelNames], names=self.channelNames)
+
+
+class StreamingHistory:
+    # ColumnHistory interface backed by one raw float64 file per channel plus header.json. Memory holds a
+    # fixed ring of the latest chunkSize rows; rows not yet on disk are written out when the ring is full,
+    # on flush() and before a column is read, the header on flush() and close(). Reads go through np.memmap.
+    # close() (or leaving a with block) writes everything and releases the files.
+    HEADER = 'header.json'
+
+    def __init__(self, path, channelNames, chunkSize=4096, mode='w'):
+        self.path = path
+        self.channelNames = list(channelNames)
+        self.index = {name: i for i, name in enumerate(self.channelNames)}
+        self.chunkSize = chunkSize
+        self.files = [os.path.join(path, 'ch{:04d}.f64'.format(i)) for i in range(len(self.channelNames))]
+        self.handles = None
+        self.readOnly = mode == 'r'
+
+        if self.readOnly:
+            with open(os.path.join(path, self.HEADER)) as f:
+                self.n = json.load(f)['n']
+            self.written = self.n
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.ring = np.empty((len(self.channelNames), chunkSize))
+            self.handles = [open(fn, 'wb') for fn in self.files]
+            self.n = 0
+            self.written = 0  # rows on disk, the rest are only in the ring
+            self.writeHeader()
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, cls.HEADER)) as f:
+            header = json.load(f)
+        return cls(path, header['channelNames'], header['chunkSize'], mode='r')
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): self.close()
+
+    def writeHeader(self):
+        header = {'channelNames': self.channelNames, 'chunkSize': self.chunkSize, 'n': self.n, 'dtype': '<f8'}
+        tmpFile = os.path.join(self.path, self.HEADER + '.tmp')
+        with open(tmpFile, 'w') as f:
+            json.dump(header, f)
+        os.replace(tmpFile, os.path.join(self.path, self.HEADER))
+
+    def __len__(self): return self.n
+
+    def __getitem__(self, i):
+        return self.toArray()[i].tolist()
+
+    def reserve(self, nSteps):
+        pass  # files grow chunk by chunk
+
+    def append(self, row):
+        self.ring[:, self.n % self.chunkSize] = row
+        self.n += 1
+        if self.n - self.written == self.chunkSize:
+            self.flush()
+
+    def extend(self, block):
+        # bulk append of a (steps, channels) array, written straight through, the ring keeps its tail
+        block = np.asarray(block, dtype='<f8')
+        self.writePending()
+        for i, fh in enumerate(self.handles):
+            block[:, i].tofile(fh)
+        tail = block[-self.chunkSize:]
+        self.ring[:, (self.n + len(block) - len(tail) + np.arange(len(tail))) % self.chunkSize] = tail.T
+        self.n += len(block)
+        self.written = self.n
+
+    def writePending(self):
+        # rows only in the ring go to the channel files
+        if self.readOnly or self.written == self.n:
+            return
+        start, stop = self.written % self.chunkSize, self.n % self.chunkSize
+        parts = [slice(start, stop)] if start < stop else [slice(start, None), slice(None, stop)]
+        for i, fh in enumerate(self.handles):
+            for part in parts:
+                self.ring[i, part].astype('<f8').tofile(fh)
+            fh.flush()
+        self.written = self.n
+
+    def flush(self):
+        if self.readOnly:
+            return
+        self.writePending()
+        self.writeHeader()
+
+    def close(self):
+        if self.handles is not None:
+            self.flush()
+            for fh in self.handles:
+                fh.close()
+            self.handles = None
+            self.readOnly = True
+
+    def column(self, name):
+        # read-only memory map of the whole channel, rows still in the ring are written out first
+        self.writePending()
+        if not self.n:
+            return np.empty(0)
+        return np.memmap(self.files[self.index[name]], dtype='<f8', mode='r', shape=(self.n,))
+
+    def last(self, name):
+        if not self.readOnly:
+            return self.ring[self.index[name], (self.n - 1) % self.chunkSize]
+        return self.column(name)[-1]
+
+    def toArray(self):
+        # loads every channel, (steps, channels)
+        return np.column_stack([self.column(name) for name in self.channelNames])
+
+    def toRecords(self):
+        return np.rec.fromarrays([self.column(name) for name in self.channelNames], names=self.channelNames)
@@ -0,0 +1,127 @@
+import time
+import logging
+from collections import deque
+import mip
+from staticThermAnalysis import toCelsius
+from SaturationTable import satT
+from PlantTopology import PLANT
+
+
+class MPCController:
+    # Stateful version of optController: the horizon model is built once, each call rewrites only the
+    # rows that depend on SuctionPressure, RoomTemp, Qadded and B. CBC cannot edit coefficients in place, so
+    # the B-dependent dynamics rows are replaced when B changes; the model stays the one optController solves,
+    # auxiliary Qin columns (rhs-only updates) solved about 20% slower. warmStart starts from the shifted plan.
+    # status and failures report the solves, a failed solve switches everything off like optController.
+    def __init__(self, T=10, plant=PLANT, ONPOWER=600, SLIDEPOWER=1000, lamb1=40, DEC=.5, TRN=.005, TMPSET=0,
+                 SPSET=18, warmStart=False, logSize=1000):
+        n, m = plant.compressors, plant.evaporators
+        self.T, self.n, self.m = T, n, m
+        self.DEC, self.TRN, self.TMPSET = DEC, TRN, TMPSET
+        self.warmStart = warmStart
+
+        t0 = time.perf_counter()
+        M = mip.Model()
+        M.verbose = 0
+        self.M = M
+
+        # variables
+        self.s = M.add_var_tensor((T, n), 's', ub=1)  # slide valves in [0, 1]
+        self.o = M.add_var_tensor((T, n), 'o', var_type=mip.BINARY)  # on/off comp in {0, 1}
+        self.e = M.add_var_tensor((T, m), 'e', var_type=mip.BINARY)  # on/off evap in {0, 1}
+        self.sp = M.add_var_tensor((T,), 'sp', lb=float('-inf'))  # suction pressure for each time
+        spAbs = M.add_var_tensor((T,), 'spAbs')
+        self.Tmp = M.add_var_tensor((T,), 'Tmp', lb=float('-inf'))  # temperature for each time
+        s, o = self.s, self.o
+
+        # objectives
+        power = mip.xsum([ONPOWER * o[i, j] + SLIDEPOWER * s[i, j] for i in range(T) for j in range(n)])
+        switchComp = mip.xsum([o[i, j] - o[i - 1, j] for i in range(1, T) for j in range(n)])
+        SPcost = mip.xsum([spAbs[i] for i in range(T)])
+        M.objective = mip.minimize(power + lamb1 * SPcost + switchComp)
+
+        # parameter rows, right-hand sides are set in update()
+        self.spInit = M.add_constr(self.sp[0] == 0)
+        self.tmpInit = M.add_constr(self.Tmp[0] == 0)
+        self.B = None
+        self.Qadded = None
+        self.dynRows = []
+        self.tmpRows = []
+
+        for i in range(T - 1):
+            M += self.Tmp[i + 1] <= TMPSET
+        for i in range(T):
+            M += spAbs[i] >= self.sp[i] - SPSET
+            for j in range(n):
+                M += s[i, j] <= o[i, j] * 1
+
+        self.buildTime = time.perf_counter() - t0
+        self.solves = 0
+        self.failures = 0
+        self.status = None
+        self.updateTime = 0
+        self.solveTime = 0
+        self.log = deque(maxlen=logSize)  # (updateTime, solveTime, status) per call
+
+    def setDynamics(self, B, Qadded):
+        T, n, m, DEC, TRN = self.T, self.n, self.m, self.DEC, self.TRN
+        e, o, s, sp, Tmp = self.e, self.o, self.s, self.sp, self.Tmp
+        if self.dynRows:
+            self.M.remove(self.dynRows)
+
+        Qin = [B * mip.xsum([e[i, j] for j in range(m)]) for i in range(T)]
+        Duty = [mip.xsum([(.1 * o[i, j] + .9 * s[i, j]) / n for j in range(n)]) for i in range(T)]
+        spEq = [.0202 * Qin[i] - 31.7623 * Duty[i] + 24.6082 for i in range(T)]  # from fitting via thermo dynamic analysis
+
+        self.tmpRows = [self.M.add_constr(Tmp[i + 1] == Tmp[i] + TRN * (Qadded - Qin[i])) for i in range(T - 1)]
+        spRows = [self.M.add_constr(sp[i + 1] == DEC * sp[i] + (1 - DEC) * spEq[i]) for i in range(T - 1)]
+        self.dynRows = self.tmpRows + spRows
+        self.B = B
+
+    def update(self, SuctionPressure, RoomTemp, Qadded):
+        TempDiff = RoomTemp - toCelsius(satT(SuctionPressure))
+        B = 6.5 * TempDiff
+
+        self.spInit.rhs = SuctionPressure
+        self.tmpInit.rhs = RoomTemp
+        if B != self.B:
+            self.setDynamics(B, Qadded)
+        elif Qadded != self.Qadded:
+            for row in self.tmpRows:
+                row.rhs = self.TRN * Qadded
+        self.Qadded = Qadded
+
+    def shiftStart(self):
+        # previous plan advanced one step, last step repeated; CBC completes the continuous variables
+        T = self.T
+        start = []
+        for var, width in ((self.o, self.n), (self.e, self.m)):
+            for i in range(T):
+                for j in range(width):
+                    x = var[min(i + 1, T - 1), j].x
+                    if x is not None:
+                        start.append((var[i, j], round(x)))
+        self.M.start = start
+
+    def __call__(self, SuctionPressure, RoomTemp, Qadded, SlideValves):
+        t0 = time.perf_counter()
+        self.update(SuctionPressure, RoomTemp, Qadded)
+        t1 = time.perf_counter()
+
+        self.status = self.M.optimize()
+        self.updateTime, self.solveTime = t1 - t0, time.perf_counter() - t1
+        self.solves += 1
+        self.log.append((self.updateTime, self.solveTime, self.status))
+
+        if self.status == mip.OptimizationStatus.OPTIMAL:
+            compressors = [self.s[0, j].x if self.o[0, j].x > 0 else -1 for j in range(self.n)]
+            evaporators = [self.e[0, j].x for j in range(self.m)]
+            if self.warmStart:
+                self.shiftStart()
+        else:
+            logging.getLogger(__name__).warning('MPC solve ended %s, switching everything off', self.status.name)
+            self.failures += 1
+            compressors = [-1] * self.n
+            evaporators = [0] * self.m
+
+        return [compressors, evaporators]
@@ -0,0 +1,158 @@
+import numpy as np
+from SystemEvents import BaseSimulation
+from EnsembleSimulator import ensembleChannels, ensemblePosters, PARAMETERS
+from RefrigeratorSimulator import toMin
+
+# Monte Carlo over Qadded realisations. Run r draws its load noise from its own Generator spawned from
+# SeedSequence(seed), so a run reproduces regardless of batch size or order. Batches of runs advance as one
+# EnsembleSimulator, and per-step statistics are folded into fixed-size accumulators as the batches go.
+
+BANDCHANNELS = ('RoomTemp', 'TotalCompressorPower', 'TotalEnergy')
+
+
+class BulkNoise:
+    # U[0, 1) noise for a batch of runs, drawn block steps ahead from each run's own Generator
+    def __init__(self, seedSeqs, block=1024):
+        self.gens = [np.random.Generator(np.random.PCG64(s)) for s in seedSeqs]
+        self.block = block
+        self.buffer = np.empty((block, len(self.gens)))
+        self.k = block
+
+    def __call__(self, n):
+        if self.k == self.block:
+            for j, gen in enumerate(self.gens):
+                self.buffer[:, j] = gen.random(self.block)
+            self.k = 0
+        self.k += 1
+        return self.buffer[self.k - 1]
+
+
+class BandAccumulator:
+    # Per-step mean/variance (merged batch by batch), extremes and a fixed-bin histogram for quantiles.
+    # Bins span [lo, hi] per step, samples outside land in the edge bins; memory is rows x bins
+    def __init__(self, lo, hi, bins=256):
+        span = np.maximum(hi - lo, 1e-9 * np.maximum(np.abs(lo), 1))
+        self.lo = lo - span / 2  # widen the pilot range, later runs may spread further
+        self.width = 2 * span / bins
+        self.bins = bins
+        rows = len(lo)
+        self.hist = np.zeros((rows, bins), dtype=np.int64)
+        self.n = 0
+        self.mean = np.zeros(rows)
+        self.m2 = np.zeros(rows)
+        self.min = np.full(rows, np.inf)
+        self.max = np.full(rows, -np.inf)
+
+    def add(self, row, values):
+        idx = np.clip(((values - self.lo[row]) / self.width[row]).astype(np.int64), 0, self.bins - 1)
+        self.hist[row] += np.bincount(idx, minlength=self.bins)
+        self.min[row] = min(self.min[row], values.min())
+        self.max[row] = max(self.max[row], values.max())
+
+        # Chan et al. merge of the batch into the running moments
+        n, nB = self.n, len(values)
+        meanB = values.mean()
+        delta = meanB - self.mean[row]
+        self.mean[row] += delta * nB / (n + nB)
+        self.m2[row] += ((values - meanB) ** 2).sum() + delta ** 2 * n * nB / (n + nB)
+
+    def std(self): return np.sqrt(self.m2 / max(self.n - 1, 1))
+
+    def quantile(self, q):
+        cum = np.cumsum(self.hist, axis=1)
+        target = q * cum[:, -1]
+        i = np.minimum((cum < target[:, None]).sum(axis=1), self.bins - 1)
+        below = np.where(i > 0, cum[np.arange(len(i)), i - 1], 0)
+        inBin = np.maximum(self.hist[np.arange(len(i)), i], 1)
+        val = self.lo + self.width * (i + (target - below) / inBin)
+        return np.clip(val, self.min, self.max)
+
+
+class MonteCarlo:
+    def __init__(self, T=toMin(3), runs=1000, batch=500, seed=0, every=1, bins=256, pilot=32, **overrides):
+        # overrides are ensembleChannels values shared by every run, e.g. QaddedNoise=800
+        self.T = T
+        self.runs = runs
+        self.batch = batch
+        self.seedSeqs = np.random.SeedSequence(seed).spawn(runs)
+        self.every = every  # record every n-th step
+        self.bins = bins
+        self.pilot = min(pilot, runs)  # runs used to place the histogram bins
+        self.overrides = overrides
+        self.bands = {}
+        self.time = None
+
+    def simulate(self, first, n, sample):
+        # runs first..first+n-1 as one ensemble, sample(row, name, values) for every recorded step
+        posters = ensemblePosters(noise=BulkNoise(self.seedSeqs[first:first + n]))
+        sim = BaseSimulation(posters, ensembleChannels(n, **self.overrides))
+        plan = sim.compile()
+        vals = plan.vals
+        timeSlot = plan.slot(sim.simulator.getChannel('Time'))
+        slots = [(name, plan.slot(sim.simulator.getChannel(name))) for name in BANDCHANNELS]
+        dT = sim.simulator.getChannel('DeltaT').value
+
+        steps = int(np.ceil(self.T / dT))
+        times = []
+        for k in range(steps + 1):
+            if k:
+                plan.step()
+            if k % self.every == 0:
+                for name, s in slots:
+                    sample(len(times), name, vals[s])
+                times.append(vals[timeSlot])
+        return np.array(times)
+
+    def run(self):
+        # pilot runs fix each step's bin range, then every run (pilot included) is accumulated
+        pilot = {name: [] for name in BANDCHANNELS}
+        self.time = self.simulate(0, self.pilot, lambda row, name, v: pilot[name].append(v.copy()))
+        self.bands = {}
+        for name, rows in pilot.items():
+            rows = np.array(rows)
+            acc = BandAccumulator(rows.min(axis=1), rows.max(axis=1), self.bins)
+            for row, values in enumerate(rows):
+                acc.add(row, values)
+            acc.n = self.pilot
+            self.bands[name] = acc
+        del pilot
+
+        for first in range(self.pilot, self.runs, self.batch):
+            n = min(self.batch, self.runs - first)
+            self.simulate(first, n, lambda row, name, v: self.bands[name].add(row, v))
+            for acc in self.bands.values():
+                acc.n += n
+        return self.confidenceBands()
+
+    def confidenceBands(self, levels=(.5, .9)):
+        # per channel: time, mean, std and (lower, upper) quantile bands for each central level
+        out = {}
+        for name, acc in self.bands.items():
+            bands = {level: (acc.quantile((1 - level) / 2), acc.quantile((1 + level) / 2)) for level in levels}
+            out[name] = {'time': self.time, 'mean': acc.mean.copy(), 'std': acc.std(), 'median': acc.quantile(.5),
+                         'min': acc.min.copy(), 'max': acc.max.copy(), 'bands': bands}
+        return out
+
+
+def plotBands(result):
+    import matplotlib.pyplot as plt
+
+    for i, (name, r) in enumerate(result.items()):
+        plt.subplot(len(result), 1, i + 1)
+        for level, (lo, hi) in sorted(r['bands'].items(), reverse=True):
+            plt.fill_between(r['time'], lo, hi, alpha=.3, label='{:.0%}'.format(level))
+        plt.plot(r['time'], r['median'], label='median')
+        plt.ylabel(name)
+        plt.legend(loc='upper left')
+    plt.show()
+
+
+if __name__ == '__main__':
+    import time
+    mc = MonteCarlo(toMin(3), runs=2000, batch=500, seed=42, QaddedNoise=PARAMETERS['QaddedNoise'] * 2)
+    t = time.perf_counter()
+    result = mc.run()
+    print('{} runs in {:.1f} s'.format(mc.runs, time.perf_counter() - t))
+    energy = result['TotalEnergy']
+    lo, hi = energy['bands'][.9]
+    print('TotalEnergy after 3 days: median {:.0f} kWh, 90% band [{:.0f}, {:.0f}]'.format(energy['median'][-1], lo[-1], hi[-1]))
@@ -0,0 +1,39 @@
+# Equipment counts of the plant. Channels (RefrigeratorSimulator.makeChannels), the feedback controllers,
+# the MPC and the animation layout are all built from one PlantTopology, duty and power math works on the
+# SlideValves array whatever its length.
+
+
+def letterName(i):
+    # 0 -> A, 25 -> Z, 26 -> AA, like spreadsheet columns
+    name = ''
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        name = chr(ord('A') + r) + name
+    return name
+
+
+class PlantTopology:
+    def __init__(self, compressors, evaporators, compressorsOn=None, evaporatorsOn=None, stageDuty=None):
+        self.compressors = compressors
+        self.evaporators = evaporators
+        # running at the start of a simulation, a third of the compressors and 60% of the evaporators by default
+        self.compressorsOn = round(compressors / 3) if compressorsOn is None else compressorsOn
+        self.evaporatorsOn = round(evaporators * .6) if evaporatorsOn is None else evaporatorsOn
+        # share of the total duty each compressor covers when the feedback controller stages them in order
+        self.stageDuty = 1 / compressors if stageDuty is None else stageDuty
+
+    @property
+    def slideValveNames(self): return ['SlideValve' + letterName(i) for i in range(self.compressors)]
+
+    @property
+    def evaporatorNames(self): return ['Evaporator' + letterName(i) for i in range(self.evaporators)]
+
+    def __repr__(self):
+        return 'PlantTopology(compressors={}, evaporators={}, stageDuty={})'.format(
+            self.compressors, self.evaporators, self.stageDuty)
+
+
+# the original test plant: six slide valves of which four stages cover full duty (SlideValveE and F stay off),
+# larger sites stage every compressor, e.g. PlantTopology(100, 200)
+PLANT = PlantTopology(compressors=6, evaporators=5, stageDuty=.25)
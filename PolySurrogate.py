@@ -0,0 +1,80 @@
+import json
+from itertools import combinations_with_replacement
+import numpy as np
+
+
+def polyPowers(nFeatures, deg):
+    # exponent layout of sklearn PolynomialFeatures(degree=deg) with the bias column
+    powers = []
+    for d in range(deg + 1):
+        for comb in combinations_with_replacement(range(nFeatures), d):
+            powers.append(tuple(comb.count(f) for f in range(nFeatures)))
+    return powers
+
+
+def quadratic2(c0, c1, c2, c3, c4, c5):
+    # degree 2 in 2 features (the SP fit), terms 1, x0, x1, x0^2, x0 x1, x1^2 factored; a closure reads its
+    # coefficients about as fast as constants, a partial over an 8 argument function is a third slower
+    def scalar(x0, x1): return c0 + x0 * (c1 + c3 * x0 + c4 * x1) + x1 * (c2 + c5 * x1)
+    return scalar
+
+
+class PolySurrogate:
+    # Polynomial from polyFit coefficients, evaluated without sklearn on the stored coefficients: scalars by
+    # quadratic2 over them for the SP fit's layout, otherwise as a sum of float products (numpy overhead is
+    # several times the polynomial here), arrays (any broadcastable shapes) through one vectorized sum of monomials
+    def __init__(self, coef, deg, nFeatures=2):
+        self.coef = [float(c) for c in coef]
+        self.deg = deg
+        self.nFeatures = nFeatures
+        self.powers = polyPowers(nFeatures, deg)
+        if len(self.powers) != len(self.coef):
+            raise ValueError('{} coefficients given, degree {} in {} features needs {}'.format(
+                len(self.coef), deg, nFeatures, len(self.powers)))
+        # nonzero terms as (coefficient, ((feature, power), ...)) with the zero powers left out
+        self.terms = [(c, tuple((f, p) for f, p in enumerate(power) if p))
+                      for c, power in zip(self.coef, self.powers) if c != 0]
+        self.scalar = quadratic2(*self.coef) if (nFeatures, deg) == (2, 2) else self.sumTerms
+
+    def __call__(self, *x):
+        if any(np.ndim(xi) for xi in x):
+            return self.batch(*x)
+        return self.scalar(*x)
+
+    def sumTerms(self, *x):
+        out = 0.
+        for c, monomial in self.terms:
+            for f, p in monomial:
+                c *= x[f] ** p
+            out += c
+        return out
+
+    def batch(self, *x):
+        x = [np.asarray(xi, dtype=float) for xi in x]
+        out = np.zeros(np.broadcast_shapes(*[xi.shape for xi in x]))
+        for c, power in zip(self.coef, self.powers):
+            if c == 0:
+                continue
+            term = c
+            for xi, p in zip(x, power):
+                if p:
+                    term = term * xi ** p
+            out += term
+        return out
+
+    def toDict(self):
+        return {'coef': self.coef, 'deg': self.deg, 'nFeatures': self.nFeatures}
+
+    @classmethod
+    def fromDict(cls, data):
+        return cls(data['coef'], data['deg'], data.get('nFeatures', 2))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.toDict(), f, indent=4)
+            f.write('\n')
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.fromDict(json.load(f))
@@ -0,0 +1,161 @@
+import json
+import time
+import numpy as np
+
+
+class PosterStats:
+    # call count, total and a ring buffer of the latest wall times for percentiles
+    def __init__(self, name, keep=65536):
+        self.name = name
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+        self.samples = np.empty(keep)
+
+    def add(self, dt):
+        self.samples[self.count % len(self.samples)] = dt
+        self.count += 1
+        self.total += dt
+        if dt > self.max:
+            self.max = dt
+
+    def summary(self):
+        kept = self.samples[:min(self.count, len(self.samples))]
+        p50, p90, p99 = np.percentile(kept, [50, 90, 99]) if len(kept) else (0., 0., 0.)
+        return {'count': self.count, 'total': self.total, 'mean': self.total / max(self.count, 1),
+                'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'max': self.max}
+
+
+def timed(fn, stats):
+    clock = time.perf_counter
+
+    def wrapper(*args):
+        t = clock()
+        out = fn(*args)
+        stats.add(clock() - t)
+        return out
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+class Profiler:
+    # Per-poster wall times and steps per second for a BaseSimulation. enable() swaps timing wrappers into the
+    # poster systems (and a compiled plan's namespace) and the step entry points, disable() puts the originals
+    # back, so a disabled profiler costs nothing. Timings cover the system call of each poster (update) and,
+    # when not compiled, the post phase. A plan compiled while enabled is wrapped by compile(), disable() also
+    # restores its namespace. EventSimulation.profile() raises, its runSim drives the step function directly.
+    def __init__(self, sim, keep=65536):
+        self.sim = sim
+        self.keep = keep
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.update = {}
+        self.post = {}
+        self.steps = 0
+        self.wall = 0.
+
+    def stats(self, table, P):
+        if P.name not in table:
+            table[P.name] = PosterStats(P.name, self.keep)
+        return table[P.name]
+
+    def enable(self):
+        if self.enabled:
+            return self
+        self.enabled = True
+        sim = self.sim
+        for P in sim.simulator.posters:
+            P.system = timed(P.system, self.stats(self.update, P))
+            P.post = timed(P.post, self.stats(self.post, P))  # instance attribute shadows Poster.post
+        if sim.plan is None:
+            sim.step = self.countSteps(sim.step)
+        else:
+            self.wrapPlan()
+        return self
+
+    def disable(self):
+        if not self.enabled:
+            return self
+        self.enabled = False
+        sim = self.sim
+        for P in sim.simulator.posters:
+            P.system = P.system.__wrapped__
+            del P.post
+        if 'step' in vars(sim):
+            del sim.step
+        self.unwrapPlan()
+        return self
+
+    def __enter__(self): return self.enable()
+
+    def __exit__(self, *exc): self.disable()
+
+    def wrapPlan(self):
+        plan = self.sim.plan
+        if plan is None:
+            return
+        if 'step' in vars(self.sim):  # enabled before compile(), plan.step counts the steps now
+            del self.sim.step
+        namespace = plan.stepFunc.__globals__
+        for k, P in enumerate(plan.posters):
+            namespace['f{}'.format(k)] = P.system
+        plan.step = self.countSteps(plan.step)
+
+        def run(n):  # StepPlan.run bypasses plan.step when there are no multi-rate posters
+            for _ in range(n):
+                plan.step()
+        plan.run = run
+
+    def unwrapPlan(self):
+        plan = self.sim.plan
+        if plan is None:
+            return
+        namespace = plan.stepFunc.__globals__  # compiled while enabled, the wrappers were bound at build time
+        for k, P in enumerate(plan.posters):
+            namespace['f{}'.format(k)] = P.system
+        if 'step' in vars(plan):
+            del plan.step
+            del plan.run
+
+    def countSteps(self, step):
+        clock = time.perf_counter
+
+        def wrapper():
+            t = clock()
+            step()
+            self.wall += clock() - t
+            self.steps += 1
+        return wrapper
+
+    def report(self):
+        posters = {}
+        for name, stats in self.update.items():
+            posters[name] = {'update': stats.summary()}
+            if name in self.post and self.post[name].count:
+                posters[name]['post'] = self.post[name].summary()
+        return {'steps': self.steps, 'wall': self.wall, 'stepsPerSecond': self.steps / self.wall if self.wall else 0.,
+                'posters': posters}
+
+    def toJSON(self, path=None):
+        text = json.dumps(self.report(), indent=4)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    def toCollapsed(self, path=None):
+        # folded stacks (flamegraph.pl, speedscope): 'step;poster microseconds', untimed step overhead last
+        lines, timed = [], 0.
+        for table, phase in ((self.update, 'update'), (self.post, 'post')):
+            for name, stats in table.items():
+                if stats.count:
+                    lines.append('step;{};{} {}'.format(name, phase, round(stats.total * 1e6)))
+                    timed += stats.total
+        lines.append('step;overhead {}'.format(max(round((self.wall - timed) * 1e6), 0)))
+        text = '\n'.join(lines) + '\n'
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
@@ -1,39 +1,39 @@
 from SystemEvents import *
+import math
+from functools import partial
 import numpy as np
-import CoolProp.CoolProp as CP
-from staticThermAnalysis import toCelsius, toPASCAL
-from sklearn.preprocessing import PolynomialFeatures
+from staticThermAnalysis import toCelsius, SPFITFILE
+from SaturationTable import satT, satD, setBackend
+from PolySurrogate import PolySurrogate
+from PlantTopology import PLANT
 
 ### CHANNELS
 
-channels = [
-	DataChannel('Time', 0),  # minutes
-	DataChannel('DeltaT', 10),  # minutes
-	DataChannel('RoomTemp', 0),  # Celsius
-	DataChannel('AmbientTemp', 22),  # Celsius
-	DataChannel('SuctionPressure', 18),  # psia
-	DataChannel('DischargePressure', 150),  # psia
-	DataChannel('TotalCompressorPower', 1600),  # kW
-	DataChannel('TotalEnergy', 0),  # kWh
-	DataChannel('Qadded', 2000),  # kW
-	DataChannel('TotalQin', 5000),  # kW
-	DataChannel('TotalQout', 6600),  # kW
-	DataChannel('TotalMassHighFlow', 1),  # kg/min (normalized not realized)
-	DataChannel('TotalMassLowFlow', 1),  # kg/min  (normalized not realized)
-	DataChannel('CondenserFan', .5),  # Condenser  Fan Speed
-	GroupChannel('SlideValves', [DataChannel('SlideValveA', 1),
-	                             DataChannel('SlideValveB', 1),
-	                             DataChannel('SlideValveC', -1),
-	                             DataChannel('SlideValveD', -1),
-								 DataChannel('SlideValveE', -1),
-	                             DataChannel('SlideValveF', -1)]),  # -1 signifying off, on in [0, 1]
-	GroupChannel('EvaporatorsOn', [DataChannel('EvaporatorA', 1),
-	                               DataChannel('EvaporatorB', 1),
-	                               DataChannel('EvaporatorC', 1),
-	                               DataChannel('EvaporatorD', 0),
-	                               DataChannel('EvaporatorE', 0)])  # on/off state of evaporators, in {0, 1}
-]
-channels = fillOutChannels(channels)
+def makeChannels(plant=PLANT):
+	# fresh channel objects at their initial values
+	return fillOutChannels([
+		DataChannel('Time', 0),  # minutes
+		DataChannel('DeltaT', 10),  # minutes
+		DataChannel('RoomTemp', 0),  # Celsius
+		DataChannel('AmbientTemp', 22),  # Celsius
+		DataChannel('SuctionPressure', 18),  # psia
+		DataChannel('DischargePressure', 150),  # psia
+		DataChannel('TotalCompressorPower', 1600),  # kW
+		DataChannel('TotalEnergy', 0),  # kWh
+		DataChannel('Qadded', 2000),  # kW
+		DataChannel('TotalQin', 5000),  # kW
+		DataChannel('TotalQout', 6600),  # kW
+		DataChannel('TotalMassHighFlow', 1),  # kg/min (normalized not realized)
+		DataChannel('TotalMassLowFlow', 1),  # kg/min  (normalized not realized)
+		DataChannel('CondenserFan', .5),  # Condenser  Fan Speed
+		GroupChannel('SlideValves', [DataChannel(name, 1 if i < plant.compressorsOn else -1)
+		                             for i, name in enumerate(plant.slideValveNames)]),  # -1 signifying off, on in [0, 1]
+		GroupChannel('EvaporatorsOn', [DataChannel(name, 1 if i < plant.evaporatorsOn else 0)
+		                               for i, name in enumerate(plant.evaporatorNames)])  # on/off state of evaporators, in {0, 1}
+	])
+
+
+channels = makeChannels()
 
 
 ## Helper Functions
@@ -41,20 +41,25 @@ channels = fillOutChannels(channels)
 def toMin(day): return day * 24 * 60
 
 
+# Saturation properties: 'exact' calls CoolProp, setBackend('table') opts into interpolating a CoolProp table
+# (built and cached on first use, see SaturationTable.errorEstimate), which shifts results slightly
+SATBACKEND = 'exact'
+setBackend(SATBACKEND)
+
+
 def CompressorDuty(SlideValves):
 	# Total Compressor Duty given slide valves
-	slideOn = [e for e in SlideValves if e > 0]
-	return (np.sum(slideOn) * .9 + len(slideOn) * .1) / len(SlideValves)  # capacity at 0% slide valve is around 10%
+	slides = np.asarray(SlideValves)  # no copy of a GroupChannel value
+	slideOn = slides[slides > 0]
+	return (slideOn.sum() * .9 + len(slideOn) * .1) / len(slides)  # capacity at 0% slide valve is around 10%
 
 
-# Fitted SP Response Curve: equilibrium suction pressure given compressor duty and Qin
-polySP = PolynomialFeatures(degree=2)
-coeff = np.array([26.6693779, -92.8539095, .00673208269, 70.5264337, -.00463903315, 0])
+# Fitted SP Response Curve: equilibrium suction pressure given compressor duty and Qin (staticThermAnalysis output)
+spFit = PolySurrogate.load(SPFITFILE)
 
 
 def eqSuction(CDuty, Qin):
-	Xpoly = polySP.fit_transform([[CDuty, Qin]])
-	return np.dot(Xpoly, coeff)[0]
+	return spFit.scalar(CDuty, Qin)
 
 
 ### Systems
@@ -70,27 +75,38 @@ def setQadded(Time):
 	return 4000 - 2000 * np.cos(2 * np.pi * Time / toMin(2)) ** 4 + 500 * np.random.random()
 
 
-def setRoomTemp(RoomTemp, Qadded, TotalQin, DeltaT):
+def setLoadNoise(): return 500 * np.random.random()
+
+
+def setQaddedSmooth(Time, LoadNoise):
+	# setQadded with the noise drawn at sample times and held, so the load stays integrable between samples
+	return 4000 - 2000 * np.cos(2 * np.pi * Time / toMin(2)) ** 4 + LoadNoise
+
+
+def roomTempDot(Qadded, TotalQin):
 	TRANSFERCOEFF = 1 / toMin(1) / 4000  # 1 deg change over day based on flywheeling experiment + ~4000 Qadded to system
-	RoomTempDot = TRANSFERCOEFF * (Qadded - TotalQin)
-	return euler(RoomTemp, RoomTempDot, DeltaT)
+	return TRANSFERCOEFF * (Qadded - TotalQin)
+
+
+def setRoomTemp(RoomTemp, Qadded, TotalQin, DeltaT):
+	return euler(RoomTemp, roomTempDot(Qadded, TotalQin), DeltaT)
 
 
 def setTotalMassHighFlow(SuctionPressure, SlideValves):
-	return CP.PropsSI('D', 'P', toPASCAL(SuctionPressure), 'Q', 1, 'Ammonia') * CompressorDuty(SlideValves)
+	return satD(SuctionPressure) * CompressorDuty(SlideValves)
 
 
 def setTotalQin(TotalMassLowFlow, EvaporatorsOn, RoomTemp, SuctionPressure):
 	ALPHA = 342
 
-	tempDiff = RoomTemp - toCelsius(CP.PropsSI('T', 'P', toPASCAL(SuctionPressure), 'Q', 1, 'Ammonia'))
-	return ALPHA * TotalMassLowFlow * sum(EvaporatorsOn) / len(EvaporatorsOn) * tempDiff
+	tempDiff = RoomTemp - toCelsius(satT(SuctionPressure))
+	return ALPHA * TotalMassLowFlow * np.add.reduce(EvaporatorsOn) / len(EvaporatorsOn) * tempDiff
 
 
 def setTotalQout(TotalMassHighFlow, CondenserFan, AmbientTemp, DischargePressure):
 	BETA = 6122
 
-	tempDiff = toCelsius(CP.PropsSI('T', 'P', toPASCAL(DischargePressure), 'Q', 1, 'Ammonia')) - AmbientTemp
+	tempDiff = toCelsius(satT(DischargePressure)) - AmbientTemp
 	return BETA * TotalMassHighFlow * CondenserFan * tempDiff
 
 
@@ -100,10 +116,10 @@ def setTotalCompressorPower(SlideValves, SuctionPressure):
 	SPSET = 18  # 2% efficiency gain with
 	GAIN = .02  # each degree higher suction temperature after 18 psi
 
-	slideOn = [e for e in SlideValves if e > 0]
-	power = np.sum(slideOn) * SLIDEPOWER + len(slideOn) * ONPOWER
-	SPdiff = CP.PropsSI('T', 'P', toPASCAL(SPSET), 'Q', 1, 'Ammonia') - CP.PropsSI('T', 'P', toPASCAL(SuctionPressure),
-	                                                                               'Q', 1, 'Ammonia')
+	slides = np.asarray(SlideValves)
+	slideOn = slides[slides > 0]
+	power = slideOn.sum() * SLIDEPOWER + len(slideOn) * ONPOWER
+	SPdiff = satT(SPSET) - satT(SuctionPressure)
 	perc = 1 - SPdiff * GAIN  # 2%/psig efficiency gain with higher suction pressure after 18 psi
 	return perc * power
 
@@ -112,52 +128,87 @@ def setTotalEnergy(TotalEnergy, TotalCompressorPower, DeltaT):
 	return euler(TotalEnergy, TotalCompressorPower, DeltaT / 60)  # conversion from minutes to hours
 
 
-def setSuctionPressure(SuctionPressure, SlideValves, TotalQin, DeltaT):
+def totalEnergyDot(TotalCompressorPower): return TotalCompressorPower / 60  # kWh per minute
+
+
+def suctionPressureDot(SuctionPressure, SlideValves, TotalQin):
 	DECAY = .003
 	eqSP = eqSuction(CompressorDuty(SlideValves), TotalQin)
-	spDot = DECAY * (eqSP - SuctionPressure)
-	return euler(SuctionPressure, spDot, DeltaT)
+	return DECAY * (eqSP - SuctionPressure)
+
+
+def setSuctionPressure(SuctionPressure, SlideValves, TotalQin, DeltaT):
+	return euler(SuctionPressure, suctionPressureDot(SuctionPressure, SlideValves, TotalQin), DeltaT)
 
 
 ## Feedback Controllers
+# module-level functions bound to a plant with functools.partial, so posters pickle for process pools
 
-def feedbackSlideValves(SuctionPressure):
-	sp = SuctionPressure
+def slideDuty(sp):
 	if sp < 10:
-		duty = 0
+		return 0
 	elif sp < 30:
-		duty = (sp - 10) / 20
-	else:
-		duty = 1
+		return (sp - 10) / 20
+	return 1
+
+
+def stagedSlideValves(n, on, span, gain, SuctionPressure):
+	duty = slideDuty(SuctionPressure)
+	slides = []  # only the running compressors are visited, the rest are off
+	while duty > on and len(slides) < n:
+		slides.append(min(1, (duty - on) / gain))
+		duty = duty - slides[-1] * span - on
+	return slides + [-1] * (n - len(slides))
 
-	slides = [-1] * 5 # num of compressors
 
-	for i, _ in enumerate(slides):
-		if duty > .025:
-			slides[i] = min(1, (duty - .025) / .1)
-			duty = duty - slides[i] * .225 - .025
+def stagedSlideValvesArray(on, gain, steps, SuctionPressure):
+	left = np.cumsum(np.concatenate(([slideDuty(SuctionPressure)], steps)))[::2]
+	return np.where(left > on, np.minimum(1, (left - on) / gain), -1)
 
-	return slides
 
+def makeFeedbackSlideValves(plant=PLANT):
+	# compressors are staged in order, each covering plant.stageDuty of the duty (10% of it to switch on)
+	n = plant.compressors
+	on, span, gain = .1 * plant.stageDuty, .9 * plant.stageDuty, .4 * plant.stageDuty
+	if n <= 16:  # same values, the loop is faster when small
+		return partial(stagedSlideValves, n, on, span, gain)
+	# duty left for compressor i when all before it run fully open, subtracted in the same order as the loop
+	return partial(stagedSlideValvesArray, on, gain, np.tile([-span, -on], n - 1))
 
-def feedbackEvaporatorOn(RoomTemp):
-	K = 5
+
+def evaporatorsOn(m, RoomTemp):
+	K = m  # all on at 0.5 C
 	if RoomTemp < -.5:
 		N = 0
 	else:
 		N = K * (RoomTemp + .5)
 
-	return [1 if i < N else 0 for i in range(5)]
+	on = min(max(math.ceil(N), 0), m)  # evaporators i < N
+	return [1] * on + [0] * (m - on)
+
+
+def makeFeedbackEvaporatorOn(plant=PLANT): return partial(evaporatorsOn, plant.evaporators)
+
+
+feedbackSlideValves = makeFeedbackSlideValves()
+feedbackEvaporatorOn = makeFeedbackEvaporatorOn()
+
 
+# Optimization Controllers, mip is only imported when one is used
 
-# Optimization Controllers
-import mip
+def __getattr__(name):
+	if name == 'MPCController':  # persistent, warm-started equivalent of optController
+		from MPCController import MPCController
+		return MPCController
+	raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
 
 def optController(SuctionPressure, RoomTemp, Qadded, SlideValves):
+	import mip
+
 	T = 10  # Horizon
-	n = 4  # number of compressors
-	m = 5  # number of evaporators
+	n = PLANT.compressors  # number of compressors
+	m = PLANT.evaporators  # number of evaporators
 	ONPOWER = 600
 	SLIDEPOWER = 1000
 	lamb1 = 40
@@ -183,7 +234,7 @@ def optController(SuctionPressure, RoomTemp, Qadded, SlideValves):
 
 	M.objective = mip.minimize(power + lamb1 * SPcost + switchComp)
 
-	TempDiff = RoomTemp - toCelsius(CP.PropsSI('T', 'P', toPASCAL(SuctionPressure), 'Q', 1, 'Ammonia'))
+	TempDiff = RoomTemp - toCelsius(satT(SuctionPressure))
 	B = 6.5 * TempDiff
 	Qin = [B * mip.xsum([e[i, j] for j in range(m)]) for i in range(T)]
 	Duty = [mip.xsum([(.1 * o[i, j] + .9 * s[i, j]) / n for j in range(n)]) for i in range(T)]
@@ -216,7 +267,7 @@ def optController(SuctionPressure, RoomTemp, Qadded, SlideValves):
 	else:
 		print('Optimization failed')
 		compressors = [-1] * n
-		evaporators = [0] * n
+		evaporators = [0] * m
 
 	M.clear()
 	return [compressors, evaporators]
@@ -224,19 +275,46 @@ def optController(SuctionPressure, RoomTemp, Qadded, SlideValves):
 
 ## Configure Systems
 
-posters = [
-	['timer', ['Time', 'DeltaT'], ['Time'], timer],
-	func2Poster('Qadded', setQadded),
-	func2Poster('RoomTemp', setRoomTemp),
+def makePosters(plant=PLANT):
+	return [
+		['timer', ['Time', 'DeltaT'], ['Time'], timer],
+		func2Poster('Qadded', setQadded),
+		func2Poster('RoomTemp', setRoomTemp),
+		func2Poster('TotalMassHighFlow', setTotalMassHighFlow),
+		func2Poster('TotalQin', setTotalQin),
+		func2Poster('TotalQout', setTotalQout),
+		func2Poster('TotalCompressorPower', setTotalCompressorPower),
+		func2Poster('TotalEnergy', setTotalEnergy),
+		func2Poster('SuctionPressure', setSuctionPressure),
+		['SlideValveSys', ['SuctionPressure'], ['SlideValves'], makeFeedbackSlideValves(plant)],
+		['EvaporatorSys', ['RoomTemp'], ['EvaporatorsOn'], makeFeedbackEvaporatorOn(plant)]
+		# with from MPCController import MPCController:
+		# ['OptController', ['SuctionPressure', 'RoomTemp', 'Qadded', 'SlideValves'], ['SlideValves', 'EvaporatorsOn'],
+		#  MPCController(plant=plant), {'period': 30}]  # solve every 30 min, setpoints held in between
+	]
+
+
+posters = makePosters()  # with makeChannels(), the test plant PLANT
+
+# AdaptiveSimulation: states integrated from their derivatives, noise and controllers sampled every SAMPLEPERIOD
+SAMPLEPERIOD = 10  # minutes
+
+
+def makeAdaptiveChannels(): return makeChannels() + [DataChannel('LoadNoise', 0)]  # kW
+
+
+adaptivePosters = [
+	['LoadNoiseSys', [], ['LoadNoise'], setLoadNoise, {'period': SAMPLEPERIOD}],
+	['QaddedSys', ['Time', 'LoadNoise'], ['Qadded'], setQaddedSmooth],
 	func2Poster('TotalMassHighFlow', setTotalMassHighFlow),
 	func2Poster('TotalQin', setTotalQin),
 	func2Poster('TotalQout', setTotalQout),
 	func2Poster('TotalCompressorPower', setTotalCompressorPower),
-	func2Poster('TotalEnergy', setTotalEnergy),
-	func2Poster('SuctionPressure', setSuctionPressure),
-	['SlideValveSys', ['SuctionPressure'], ['SlideValves'], feedbackSlideValves],
-	['EvaporatorSys', ['RoomTemp'], ['EvaporatorsOn'], feedbackEvaporatorOn]
-	# ['OptController', ['SuctionPressure', 'RoomTemp', 'Qadded'], ['SlideValves', 'EvaporatorsOn'], optController]
+	func2Poster('RoomTemp', roomTempDot, derivative=True),
+	func2Poster('SuctionPressure', suctionPressureDot, derivative=True),
+	func2Poster('TotalEnergy', totalEnergyDot, derivative=True),
+	['SlideValveSys', ['SuctionPressure'], ['SlideValves'], feedbackSlideValves, {'period': SAMPLEPERIOD}],
+	['EvaporatorSys', ['RoomTemp'], ['EvaporatorsOn'], feedbackEvaporatorOn, {'period': SAMPLEPERIOD}]
 ]
 
 if __name__ == '__main__':
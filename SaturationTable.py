@@ -0,0 +1,174 @@
+import os
+import math
+from functools import lru_cache
+from importlib.metadata import version
+import numpy as np
+
+FLUID = 'Ammonia'
+PROPS = ('T', 'D', 'H', 'S')  # saturated vapor (Q = 1) properties served by the table
+PSIA2PA = 6894.76
+COOLPROPVERSION = version('CoolProp')
+CP = None  # CoolProp.CoolProp, loaded on first use by coolProp()
+CACHEDIR = os.environ.get('REFRIG_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'refrigeration_research'))
+
+
+def coolProp():
+    # importing CoolProp takes seconds, a cached table serves in-range pressures without it
+    global CP
+    if CP is None:
+        import CoolProp.CoolProp as CP
+    return CP
+
+
+# Backends: both take pressure in psia (scalar or array) and return SI units like CP.PropsSI
+
+class ExactSaturation:
+    name = 'exact'
+
+    def prop(self, key, psia):
+        if np.ndim(psia):
+            return _exactArray(key, np.asarray(psia, dtype=float))
+        return _exactScalar(key, psia)
+
+    def T(self, psia): return self.prop('T', psia)
+
+    def D(self, psia): return self.prop('D', psia)
+
+    def H(self, psia): return self.prop('H', psia)
+
+    def S(self, psia): return self.prop('S', psia)
+
+    def Hcomp(self, psiaOut, psia):
+        # enthalpy after isentropic compression of saturated vapor at psia to psiaOut
+        return self.prop(('Hcomp', psiaOut), psia)
+
+
+# keys are property names or ('Hcomp', psiaOut)
+
+@lru_cache(maxsize=256)  # constant pressures (SPSET, DischargePressure) are looked up every step
+def _exactScalar(key, psia):
+    CP = coolProp()
+    if type(key) is tuple:
+        return CP.PropsSI('H', 'P', PSIA2PA * key[1], 'S', _exactScalar('S', psia), FLUID)
+    return CP.PropsSI(key, 'P', PSIA2PA * psia, 'Q', 1, FLUID)
+
+
+def _exactArray(key, psia):
+    CP = coolProp()
+    pa = PSIA2PA * psia.ravel()  # PropsSI only takes 1-D arrays
+    if type(key) is tuple:
+        vals = CP.PropsSI('H', 'P', PSIA2PA * key[1], 'S', CP.PropsSI('S', 'P', pa, 'Q', 1, FLUID), FLUID)
+    else:
+        vals = CP.PropsSI(key, 'P', pa, 'Q', 1, FLUID)
+    return vals.reshape(psia.shape)
+
+
+class SaturationTable(ExactSaturation):
+    # Linear interpolation on a log(P)-uniform grid, falls back to CoolProp outside [pMin, pMax]. The table of a
+    # property is built (or loaded from cacheDir) the first time that property is looked up.
+    name = 'table'
+
+    def __init__(self, pMin=5, pMax=400, n=4001, cacheDir=CACHEDIR):
+        self.pMin = pMin
+        self.pMax = pMax
+        self.n = n
+        self.x0 = math.log(pMin)
+        self.invDx = (n - 1) / (math.log(pMax) - self.x0)
+        self.x = np.linspace(self.x0, math.log(pMax), n)
+        self.cacheDir = cacheDir
+        self.values = {}
+        self.lists = {}  # python floats for the scalar path
+        self.errorEstimate = {}  # max interpolation error per property, estimated from samples, not a bound
+
+    def addTable(self, key):
+        name = key if type(key) is str else '{}{}'.format(*key)
+        cacheFile = None
+        if self.cacheDir:
+            cacheFile = os.path.join(self.cacheDir, 'sat_{}_{}_{}_{}_{}_{}.npz'.format(
+                FLUID, name, self.pMin, self.pMax, self.n, COOLPROPVERSION))
+
+        if cacheFile and os.path.exists(cacheFile):
+            data = np.load(cacheFile)
+        else:
+            data = self.build(key)
+            if cacheFile:
+                os.makedirs(self.cacheDir, exist_ok=True)
+                tmpFile = cacheFile + '.{}.tmp.npz'.format(os.getpid())
+                np.savez(tmpFile, **data)
+                os.replace(tmpFile, cacheFile)
+
+        self.values[key] = data['values']
+        self.lists[key] = data['values'].tolist()
+        self.errorEstimate[key] = float(data['err'])
+
+    def build(self, key):
+        vals = _exactArray(key, np.exp(self.x))
+        mid = _exactArray(key, np.exp((self.x[1:] + self.x[:-1]) / 2))
+        # error at the interval midpoints and h^2/8 |f''| with f'' taken from the table's own second differences,
+        # both only sampled, the larger of the two estimates the maximum
+        midErr = np.max(np.abs((vals[1:] + vals[:-1]) / 2 - mid))
+        curvErr = np.max(np.abs(np.diff(vals, 2))) / 8
+        return {'values': vals, 'err': max(midErr, curvErr)}
+
+    def prop(self, key, psia):
+        if key not in self.lists:
+            self.addTable(key)
+        if np.ndim(psia):
+            return self.propArray(key, psia)
+
+        if psia > 0:
+            x = (math.log(psia) - self.x0) * self.invDx
+            if 0 <= x < self.n - 1:
+                i = int(x)
+                vals = self.lists[key]
+                return vals[i] + (x - i) * (vals[i + 1] - vals[i])
+            if x == self.n - 1:
+                return self.lists[key][-1]
+        return _exactScalar(key, psia)
+
+    def propArray(self, key, psia):
+        psia = np.asarray(psia, dtype=float)
+        inside = (psia >= self.pMin) & (psia <= self.pMax)
+        out = np.interp(np.log(np.where(inside, psia, self.pMin)), self.x, self.values[key])
+        if not inside.all():
+            out[~inside] = _exactArray(key, psia[~inside])
+        return out
+
+
+## Backend selection
+
+_backends = {}
+_active = ExactSaturation()
+
+
+def getBackend(name):
+    if name not in _backends:
+        if name == 'exact':
+            _backends[name] = ExactSaturation()
+        elif name == 'table':
+            _backends[name] = SaturationTable()
+        else:
+            raise ValueError('Unknown saturation backend {}, expected exact or table'.format(name))
+    return _backends[name]
+
+
+def setBackend(name):
+    global _active
+    _active = getBackend(name)
+    return _active
+
+
+def activeBackend(): return _active
+
+
+def satT(psia): return _active.prop('T', psia)
+
+
+def satD(psia): return _active.prop('D', psia)
+
+
+if __name__ == '__main__':
+    table = getBackend('table')
+    for key in PROPS:
+        table.addTable(key)
+    print('estimated max interpolation error vs CoolProp: ', table.errorEstimate)
@@ -0,0 +1,213 @@
+import os
+import math
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from SystemEvents import TimedSimulation
+
+# Scenario overrides are dicts: channel names set initial values, poster names (e.g. 'SlideValveSys') swap in
+# another system function, 'seed' seeds np.random for the run. Systems and factories must be picklable
+# (module-level functions) to reach the workers. Runs without a 'seed' are seeded from ScenarioRunner.seed, one
+# SeedSequence child per scenario, so forked workers never share a random stream.
+
+KPIS = ('TotalEnergy', 'TimeOutsideBand', 'SPMean', 'SPStd', 'SPMin', 'SPMax')
+
+
+def grid(**axes):
+    # cartesian product of override values, grid(DeltaT=[5, 10], AmbientTemp=[15, 25]) -> 4 scenarios
+    names = list(axes)
+    return [dict(zip(names, vals)) for vals in product(*axes.values())]
+
+
+def scenarioKPIs(sim, band=(-1, 1)):
+    time = sim.getChVal('Time')
+    roomTemp = sim.getChVal('RoomTemp')[1:]
+    sp = sim.getChVal('SuctionPressure')
+    outside = (roomTemp < band[0]) | (roomTemp > band[1])
+    return {
+        'TotalEnergy': float(sim.getChVal('TotalEnergy')[-1]),
+        'TimeOutsideBand': float(np.sum(np.diff(time)[outside])),  # minutes, step counted at its end
+        'SPMean': float(sp.mean()),
+        'SPStd': float(sp.std()),
+        'SPMin': float(sp.min()),
+        'SPMax': float(sp.max()),
+    }
+
+
+class P2Quantile:
+    # P-square streaming quantile estimate (Jain & Chlamtac), five markers regardless of sample count
+    def __init__(self, q):
+        self.q = q
+        self.heights = []
+        self.pos = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+        self.inc = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, x):
+        h = self.heights
+        if len(h) < 5:
+            h.append(x)
+            h.sort()
+            return
+
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= x < h[i + 1])
+        for i in range(k + 1, 5):
+            self.pos[i] += 1
+        for i in range(5):
+            self.desired[i] += self.inc[i]
+
+        for i in range(1, 4):
+            d = self.desired[i] - self.pos[i]
+            if (d >= 1 and self.pos[i + 1] - self.pos[i] > 1) or (d <= -1 and self.pos[i - 1] - self.pos[i] < -1):
+                d = 1 if d > 0 else -1
+                n0, n1, n2 = self.pos[i - 1], self.pos[i], self.pos[i + 1]
+                hp = h[i] + d / (n2 - n0) * ((n1 - n0 + d) * (h[i + 1] - h[i]) / (n2 - n1) +
+                                              (n2 - n1 - d) * (h[i] - h[i - 1]) / (n1 - n0))
+                if not h[i - 1] < hp < h[i + 1]:  # parabolic step overshoots, fall back to linear
+                    hp = h[i] + d * (h[i + d] - h[i]) / (self.pos[i + d] - n1)
+                h[i] = hp
+                self.pos[i] += d
+
+    def value(self):
+        h = self.heights
+        if len(h) < 5:  # exact for the first few samples
+            if not h:
+                return math.nan
+            return float(np.quantile(h, self.q))
+        return h[2]
+
+
+class OnlineStats:
+    # count, mean and variance (Welford), extremes and P-square quantiles of a stream of scalars
+    def __init__(self, quantiles=(.05, .5, .95)):
+        self.n = 0
+        self.mean = 0.
+        self.m2 = 0.
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = {q: P2Quantile(q) for q in quantiles}
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        for est in self.quantiles.values():
+            est.add(x)
+
+    @property
+    def var(self): return self.m2 / (self.n - 1) if self.n > 1 else 0.
+
+    def summary(self):
+        return {'n': self.n, 'mean': self.mean, 'var': self.var, 'std': math.sqrt(self.var), 'min': self.min,
+                'max': self.max, 'quantiles': {q: est.value() for q, est in self.quantiles.items()}}
+
+
+## Workers
+
+_worker = {}
+
+
+def _initWorker(posters, makeChannels, T, band, warmUp):
+    if posters is None or makeChannels is None:
+        import RefrigeratorSimulator as R  # loads the saturation table and SP fit once per worker
+        posters = R.posters if posters is None else posters
+        makeChannels = R.makeChannels if makeChannels is None else makeChannels
+    _worker.update(posters=posters, makeChannels=makeChannels, T=T, band=band)
+    if warmUp:  # first simulation pays for codegen and cache fills, keep it out of the measured runs
+        sim = TimedSimulation(posters, makeChannels())
+        sim.compile()
+        sim.run(warmUp)
+
+
+def runScenario(overrides, posters, makeChannels, T, band=(-1, 1), seed=None):
+    byName = {P[0]: P for P in posters}
+    posters = [[*P[:3], overrides[P[0]], *P[4:]] if P[0] in overrides else P for P in posters]
+    channels = makeChannels()
+    chDict = {ch.name: ch for ch in channels}
+    for name, val in overrides.items():
+        if name in chDict:
+            chDict[name].value = val
+        elif name not in byName and name != 'seed':
+            raise KeyError('{}: not a channel or poster name'.format(name))
+    if 'seed' in overrides:
+        np.random.seed(overrides['seed'])
+    elif seed is not None:  # SeedSequence
+        np.random.seed(seed.generate_state(4))
+
+    sim = TimedSimulation(posters, channels)
+    sim.compile()
+    sim.runSim(T)
+    return scenarioKPIs(sim, band)
+
+
+def _runChunk(chunk):
+    w = _worker
+    return [(i, overrides, runScenario(overrides, w['posters'], w['makeChannels'], w['T'], w['band'], seed))
+            for i, overrides, seed in chunk]
+
+
+class ScenarioRunner:
+    # Runs independent TimedSimulations on a process pool; each finished run streams back its KPIs
+    # and is folded into OnlineStats, histories never leave the workers
+    def __init__(self, T, posters=None, makeChannels=None, band=(-1, 1), workers=None, chunkSize=None,
+                 warmUp=10, quantiles=(.05, .5, .95), seed=None):
+        self.T = T
+        self.posters = posters  # None: RefrigeratorSimulator.posters / makeChannels
+        self.makeChannels = makeChannels
+        self.band = band
+        self.workers = workers or os.cpu_count()
+        self.chunkSize = chunkSize
+        self.warmUp = warmUp
+        self.quantiles = quantiles
+        self.seed = np.random.SeedSequence(seed).entropy  # fresh entropy when None, kept to repeat the runs
+        self.stats = {}
+
+    def chunks(self, scenarios):
+        # about four chunks per worker keeps the pool balanced without per-run IPC
+        size = self.chunkSize or max(1, -(-len(scenarios) // (4 * self.workers)))
+        seeds = np.random.SeedSequence(self.seed).spawn(len(scenarios))
+        indexed = [(i, overrides, seeds[i]) for i, overrides in enumerate(scenarios)]
+        return [indexed[i:i + size] for i in range(0, len(indexed), size)]
+
+    def iterate(self, scenarios):
+        # yields (index, overrides, kpis) in completion order and updates self.stats
+        scenarios = list(scenarios)
+        self.stats = {name: OnlineStats(self.quantiles) for name in KPIS}
+        initargs = (self.posters, self.makeChannels, self.T, self.band, self.warmUp)
+        with ProcessPoolExecutor(self.workers, initializer=_initWorker, initargs=initargs) as pool:
+            futures = [pool.submit(_runChunk, chunk) for chunk in self.chunks(scenarios)]
+            for future in as_completed(futures):
+                for i, overrides, kpis in future.result():
+                    for name, stats in self.stats.items():
+                        stats.add(kpis[name])
+                    yield i, overrides, kpis
+
+    def run(self, scenarios, callback=None):
+        # aggregate summary per KPI, callback(index, overrides, kpis) sees every run as it finishes
+        for result in self.iterate(scenarios):
+            if callback is not None:
+                callback(*result)
+        return self.summary()
+
+    def summary(self): return {name: stats.summary() for name, stats in self.stats.items()}
+
+
+if __name__ == '__main__':
+    from RefrigeratorSimulator import toMin
+
+    scenarios = [dict(s, seed=i) for i, s in enumerate(grid(AmbientTemp=[15, 22, 30], RoomTemp=[-1, 0, 1]))]
+    runner = ScenarioRunner(toMin(3))
+    summary = runner.run(scenarios, lambda i, o, k: print(i, o, 'TotalEnergy {:.0f}'.format(k['TotalEnergy'])))
+    for name, s in summary.items():
+        print('{}: mean {:.4g}, std {:.4g}, quantiles {}'.format(
+            name, s['mean'], s['std'], {q: round(v, 4) for q, v in s['quantiles'].items()}))
@@ -1,4 +1,7 @@
 from typing import List, Callable
+from operator import itemgetter
+import numpy as np
+from HistoryStore import ColumnHistory, StreamingHistory
 
 
 class DataChannel:
@@ -9,30 +12,104 @@ class DataChannel:
         self.publishers: List[str] = []
 
 
+class SlotChannel(DataChannel):
+    # member of a GroupChannel, its value lives in slot `index` of the group's array
+    def __init__(self, name: str, group, index: int):
+        self.name = name
+        self.group = group
+        self.index = index
+        self.subscribers: List[str] = []
+        self.publishers: List[str] = []
+
+    @property
+    def value(self):
+        return self.group.array[self.index]
+
+    @value.setter
+    def value(self, value):
+        group = self.group
+        if group.array.dtype.kind != 'f':
+            group.fit(value)
+        try:
+            group.array[self.index] = value
+        except ValueError:  # first (N,) value of an ensemble
+            group.widen(np.shape(value))
+            group.array[self.index] = value
+
+
 class GroupChannel(DataChannel):
+    # Member values are stored in one array, the members are SlotChannels built from the given channels (which
+    # are left untouched) reading and writing their slot. value is a read-only view of the whole array (no copy),
+    # assignment is one slice write of as many members as values given. The array keeps the members' dtype, an
+    # integer array becomes float the first time a float is written.
     def __init__(self, name: str, dataChannels: List[DataChannel]):
-        self.dataChannels = dataChannels
-        super().__init__(name, [dC.value for dC in dataChannels])
-        
-    
+        self.setArray(np.array([dC.value for dC in dataChannels]))
+        self.dataChannels = [SlotChannel(dC.name, self, i) for i, dC in enumerate(dataChannels)]
+        super().__init__(name, self.array)
+
+    def setArray(self, array):
+        self.array = array
+        self.view = array.view()
+        self.view.flags.writeable = False
+
+    def widen(self, shape):
+        # members holding arrays of `shape` (EnsembleSimulator), current values broadcast
+        array = self.array.reshape(self.array.shape[:1] + (1,) * len(shape))
+        self.setArray(np.broadcast_to(array, self.array.shape[:1] + tuple(shape)).copy())
+
+    def fit(self, values):
+        # integer members become float once a float is written to one of them
+        if np.asarray(values).dtype.kind == 'f':
+            self.setArray(self.array.astype(float))
+
     @property
     def value(self):
-        return [dC.value for dC in self.dataChannels]
-    
+        return self.view
+
     @value.setter
     def value(self, values):
-        for i, v in enumerate(values):
-            self.dataChannels[i].value = v
+        if self.array.dtype.kind != 'f':
+            self.fit(values)
+        try:
+            self.array[:len(values)] = values
+        except ValueError:
+            self.widen(np.shape(values[0]))
+            self.array[:len(values)] = values
 
 
 class Poster:
-    def __init__(self, name, inputs, outputs, system):
+    def __init__(self, name, inputs, outputs, system, period=None, divisor=None, derivative=False):
         self.name: str = name
         self.inputs: List[DataChannel] = inputs
         self.outputs: List[DataChannel] = outputs
         self.system: Callable = system
         self.state: list = []
 
+        # multi-rate execution: run every `period` Time units or every `divisor` steps, outputs hold in between
+        if period is not None and divisor is not None:
+            raise ValueError('{}: give either period or divisor, not both'.format(name))
+        self.period = period
+        self.divisor = divisor
+        self.ticks = 0
+        self.nextDue = None
+        self.derivative = derivative  # system returns the time derivative of its output (AdaptiveSimulation)
+
+    @property
+    def multiRate(self): return self.period is not None or self.divisor is not None
+
+    def due(self, time=None):
+        # called once per simulation step
+        self.ticks += 1
+        if self.divisor is not None:
+            return (self.ticks - 1) % self.divisor == 0
+        if self.period is not None:
+            if self.nextDue is not None and time < self.nextDue - 1e-9 * self.period:
+                return False
+            self.nextDue = (time if self.nextDue is None else self.nextDue) + self.period
+            while self.nextDue <= time:
+                self.nextDue += self.period
+        return True
+
     def update(self):
         state = self.system(*[inp.value for inp in self.inputs])
         if len(self.outputs) == 1:
@@ -48,12 +125,16 @@ class SystemsHandler:
     def __init__(self):
         self.posters = []
         self.channels: List[DataChannel] = []
+        self.channelMap = {}
 
-    def registerSystem(self, name: str, inputs: list[str], outputs: list[str], system: Callable):
-        chDict = self.channelDict()
+    def registerSystem(self, name: str, inputs: list[str], outputs: list[str], system: Callable, period=None,
+                       divisor=None, derivative=False):
+        chDict = self.channelMap
         inputChannels = [chDict[inp] for inp in inputs]
         outputChannels = [chDict[out] for out in outputs]
-        self.posters.append(Poster(name, inputChannels, outputChannels, system))
+        if period is not None and 'Time' not in chDict:
+            raise ValueError('{}: period requires a Time channel'.format(name))
+        self.posters.append(Poster(name, inputChannels, outputChannels, system, period, divisor, derivative))
 
         for ch in inputChannels:
             ch.subscribers.append(name)
@@ -62,20 +143,238 @@ class SystemsHandler:
             ch.publishers.append(name)
 
     def channelDict(self):
-        return {ch.name: ch for ch in self.channels}
+        return self.channelMap
 
     def addChannel(self, channel):
         self.channels.append(channel)
+        self.channelMap.setdefault(channel.name, channel)
 
-    def getChannel(self, name): return [ch for ch in self.channels if ch.name == name][0]
+    def getChannel(self, name): return self.channelMap[name]
 
-    def globalState(self): return {ch.name: ch.value for ch in self.channels if type(ch) is DataChannel}
+    def globalState(self): return {ch.name: ch.value for ch in self.channels if type(ch) is not GroupChannel}
+
+
+class StepPlan:
+    # Posters compiled into one generated step function over a flat value list:
+    # every DataChannel owns a slot, GroupChannels resolve to tuples of member slots.
+    def __init__(self, posters: List[Poster], channels: List[DataChannel]):
+        self.posters = list(posters)
+        self.channels: List[DataChannel] = []
+        self.slots = {}
+
+        for ch in channels:
+            self.bind(ch)
+        for P in self.posters:
+            for ch in P.inputs + P.outputs:
+                self.bind(ch)
+
+        self.vals = [ch.value for ch in self.channels]
+        self.multiRate = [k for k, P in enumerate(self.posters) if P.multiRate]
+        self.due = [True] * len(self.posters)
+        self.timeSlot = next((self.slots[id(ch)] for ch in self.channels if ch.name == 'Time'), None)
+        self.source, self.stepFunc = self.build()
+
+    def bind(self, ch):
+        if type(ch) is GroupChannel:
+            for dC in ch.dataChannels:
+                self.bind(dC)
+        elif id(ch) not in self.slots:
+            self.slots[id(ch)] = len(self.channels)
+            self.channels.append(ch)
+
+    def slot(self, ch):
+        if type(ch) is GroupChannel:
+            return tuple(self.slot(dC) for dC in ch.dataChannels)
+        return self.slots[id(ch)]
+
+    def build(self):
+        namespace = {}
+        update, post = [], []
+
+        def contiguous(s): return s == tuple(range(s[0], s[0] + len(s)))
+
+        def read(ch):
+            s = self.slot(ch)
+            if type(s) is tuple:
+                if s and contiguous(s):  # members bound together, one list slice
+                    return 'v[{}:{}]'.format(s[0], s[-1] + 1)
+                return '[{}]'.format(', '.join('v[{}]'.format(i) for i in s))
+            return 'v[{}]'.format(s)
+
+        def write(ch, val, key):
+            s = self.slot(ch)
+            if type(s) is tuple:  # GroupChannel setter writes as many members as values given
+                if s and contiguous(s):
+                    return ['x = {}[:{}]'.format(val, len(s)), 'v[{}:{} + len(x)] = x'.format(s[0], s[0])]
+                namespace[key] = s
+                return ['for j, x in zip({}, {}):'.format(key, val), '    v[j] = x']
+            return ['v[{}] = {}'.format(s, val)]
+
+        for k, P in enumerate(self.posters):
+            namespace['f{}'.format(k)] = P.system
+            call = ['r{} = f{}({})'.format(k, k, ', '.join(read(inp) for inp in P.inputs))]
+            if len(P.outputs) == 1:
+                out = write(P.outputs[0], 'r{}'.format(k), 'g{}'.format(k))
+            else:
+                out = ['p = list(r{})'.format(k)]
+                for o, ch in enumerate(P.outputs):  # like Poster.post, outputs beyond the values returned hold
+                    out += ['if len(p) > {}:'.format(o)] + ['    ' + line for line in
+                                                          write(ch, 'p[{}]'.format(o), 'g{}_{}'.format(k, o))]
+
+            if P.multiRate:  # skipped posters neither update nor post (zero-order hold)
+                call = ['if due[{}]:'.format(k)] + ['    ' + line for line in call]
+                out = ['if due[{}]:'.format(k)] + ['    ' + line for line in out]
+            update += call
+            post += out
+
+        source = 'def step(v, due):\n' + ''.join('    {}\n'.format(line) for line in update + post + ['return'])
+        exec(compile(source, '<StepPlan>', 'exec'), namespace)
+        return source, namespace['step']
+
+    def load(self):
+        self.vals[:] = [ch.value for ch in self.channels]
+
+    def store(self):
+        for ch, val in zip(self.channels, self.vals):
+            ch.value = val
+
+    def schedule(self):
+        time = self.vals[self.timeSlot] if self.timeSlot is not None else None
+        for k in self.multiRate:
+            self.due[k] = self.posters[k].due(time)
+
+    def step(self):
+        if self.multiRate:
+            self.schedule()
+        self.stepFunc(self.vals, self.due)
+
+    def run(self, n):
+        if self.multiRate:
+            for _ in range(n):
+                self.step()
+            return
+
+        stepFunc, vals, due = self.stepFunc, self.vals, self.due
+        for _ in range(n):
+            stepFunc(vals, due)
+
+
+class IncrementalScheduler:
+    # Skips posters whose input channels did not change during the previous post phase.
+    # Posters must be pure functions of their inputs; list impure ones in always.
+    # Only pays off when parts of the plant settle: on the default refrigerator plant every poster sits on a
+    # feedback loop or reads Time, nothing is skipped.
+    def __init__(self, simulator: SystemsHandler, always: List[str] = ()):
+        self.posters = simulator.posters
+        self.always = {i for i, P in enumerate(self.posters) if P.name in always or not P.inputs}
+        self.multiRate = {i for i, P in enumerate(self.posters) if P.multiRate}
+        self.timeChannel = simulator.channelMap.get('Time')
+        indices = {}
+        for i, P in enumerate(self.posters):
+            indices.setdefault(P.name, []).append(i)
+
+        channels = fillOutChannels(list(simulator.channels))
+        for P in self.posters:
+            channels += [ch for ch in P.inputs + P.outputs if ch not in channels]
+        parents = {id(dC): ch for ch in channels if type(ch) is GroupChannel for dC in ch.dataChannels}
+
+        # readers of a channel: subscribers of the channel itself and of its parent GroupChannel
+        self.readers = {}
+        for ch in channels:
+            names = ch.subscribers + (parents[id(ch)].subscribers if id(ch) in parents else [])
+            self.readers[id(ch)] = {i for name in names for i in indices.get(name, [])}
+
+        # posters sharing an output channel with another publisher must re-post even when clean
+        self.exclusive = [all(len(ch.publishers) == 1 for ch in P.outputs) for P in self.posters]
+        self.watched = [[dC for ch in P.outputs for dC in (ch.dataChannels if type(ch) is GroupChannel else [ch])]
+                        for P in self.posters]
+        self.evaluations = 0
+        self.skipped = 0
+        self.invalidate()
+
+    def invalidate(self):
+        # call after changing channel values outside of the posters
+        self.dirty = set(range(len(self.posters)))
+
+    def step(self):
+        held = set()
+        if self.multiRate:
+            time = self.timeChannel.value if self.timeChannel is not None else None
+            held = {i for i in self.multiRate if not self.posters[i].due(time)}
+
+        dirty = self.dirty | self.always
+        active = [P for i, P in enumerate(self.posters) if i in dirty and i not in held]
+        for P in active:
+            P.update()
+
+        changed = set()
+        for i, P in enumerate(self.posters):
+            if i in held or (i not in dirty and self.exclusive[i]):
+                continue
+            watched = self.watched[i]
+            old = [ch.value for ch in watched]
+            P.post()
+            for ch, val in zip(watched, old):
+                if ch.value != val:
+                    changed |= self.readers[id(ch)]
+
+        self.evaluations += len(active)
+        self.skipped += len(self.posters) - len(active)
+        self.dirty = changed | (dirty & held)  # held posters run once they are due
+
+    def graph(self):
+        # poster name -> names of posters reading any of its outputs
+        graph = {}
+        for i, P in enumerate(self.posters):
+            readers = {j for ch in self.watched[i] for j in self.readers[id(ch)]}
+            graph.setdefault(P.name, set()).update(self.posters[j].name for j in readers)
+        return {name: sorted(edges) for name, edges in graph.items()}
+
+    def cycles(self):
+        # strongly connected components with a feedback loop (Tarjan), self-loops included
+        graph = self.graph()
+        index, low, stack, onStack, sccs = {}, {}, [], set(), []
+
+        def visit(v):
+            index[v] = low[v] = len(index)
+            stack.append(v)
+            onStack.add(v)
+            for w in graph[v]:
+                if w not in index:
+                    visit(w)
+                    low[v] = min(low[v], low[w])
+                elif w in onStack:
+                    low[v] = min(low[v], index[w])
+            if low[v] == index[v]:
+                scc = []
+                while True:
+                    w = stack.pop()
+                    onStack.discard(w)
+                    scc.append(w)
+                    if w == v:
+                        break
+                if len(scc) > 1 or v in graph[v]:
+                    sccs.append(sorted(scc))
+
+        for v in graph:
+            if v not in index:
+                visit(v)
+        return sccs
 
 
 class BaseSimulation:
+    continuous = False  # fixed-step simulations cannot integrate derivative posters
+
     def __init__(self, posters, channels):
         self.simulator = self.setSim(posters, channels)
+        if not self.continuous and any(P.derivative for P in self.simulator.posters):
+            raise ValueError('derivative posters need an AdaptiveSimulation')
         self.channelNames = list(self.simulator.globalState().keys())
+        self.plan = None
+        self.scheduler = None
+        self.timeChannel = self.simulator.channelMap.get('Time')
+        self.multiRate = any(P.multiRate for P in self.simulator.posters)
+        self.profiler = None
 
     def setSim(self, systems, channels):
         sim = SystemsHandler()
@@ -84,49 +383,169 @@ class BaseSimulation:
             sim.addChannel(ch)
 
         for sys in systems:
-            sim.registerSystem(*sys)
+            options = sys[4] if len(sys) > 4 else {}  # optional dict, e.g. {'period': 15}
+            sim.registerSystem(*sys[:4], **options)
 
         return sim
 
+    def compile(self):
+        # posters and channels are frozen into a StepPlan, recompile after registering new systems
+        self.plan = StepPlan(self.simulator.posters, self.simulator.channels)
+        self.scheduler = None
+        if self.profiler is not None and self.profiler.enabled:
+            self.profiler.wrapPlan()
+        return self.plan
+
+    def profile(self, enabled=True):
+        # per-poster timings and steps/s, see Profiler.py; switch with profiler.enable() / disable()
+        from Profiler import Profiler
+        if self.profiler is None:
+            self.profiler = Profiler(self)
+        return self.profiler.enable() if enabled else self.profiler.disable()
+
+    def incremental(self, always: List[str] = ()):
+        # evaluate only posters with changed inputs, replaces any compiled plan
+        self.scheduler = IncrementalScheduler(self.simulator, always)
+        self.plan = None
+        return self.scheduler
+
     def step(self):
-        [P.update() for P in self.simulator.posters]
-        [P.post() for P in self.simulator.posters]
+        if self.plan is not None:
+            self.plan.load()
+            self.plan.step()
+            self.plan.store()
+            return
+
+        if self.scheduler is not None:
+            self.scheduler.step()
+            return
+
+        posters = self.duePosters()
+        for P in posters:
+            P.update()
+        for P in posters:
+            P.post()
+
+    def duePosters(self):
+        posters = self.simulator.posters
+        if not self.multiRate:
+            return posters
+        time = self.timeChannel.value if self.timeChannel is not None else None
+        return [P for P in posters if not P.multiRate or P.due(time)]
+
+    def run(self, n):
+        if self.plan is None:
+            for _ in range(n):
+                self.step()
+            return
+
+        self.plan.load()
+        self.plan.run(n)
+        self.plan.store()
 
 class TimedSimulation(BaseSimulation):
-    def __init__(self, posters, channels):
+    def __init__(self, posters, channels, chunkSize=4096, historyPath=None, width=None):
         super().__init__(posters, channels)
-        self.history = [list(self.simulator.globalState().values())]
+        self.recorded = [ch for ch in self.simulator.channels if type(ch) is not GroupChannel]
+        self.timeChannel = self.simulator.getChannel('Time')  # required, unlike in BaseSimulation
+        if historyPath is None:
+            self.history = ColumnHistory(self.channelNames, chunkSize, width)  # width=N records N scenarios per step
+        elif width is not None:
+            raise ValueError('StreamingHistory stores one value per channel and step, width is not supported')
+        else:  # stream to disk in chunks of chunkSize steps
+            self.history = StreamingHistory(historyPath, self.channelNames, chunkSize)
+        self.record()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): self.close()
+
+    def close(self):
+        # writes out and releases a StreamingHistory's files, the history stays readable
+        self.history.close()
+
+    def record(self):
+        self.history.append([ch.value for ch in self.recorded])
 
     def step(self):
         super().step()
-        self.history.append(list(self.simulator.globalState().values()))
+        self.record()
 
     def runSim(self, T):
-        while self.simulator.globalState()['Time'] < T:
-            self.step()
+        chDict = self.simulator.channelDict()
+        if 'DeltaT' in chDict and chDict['DeltaT'].value > 0:
+            self.history.reserve(int(np.ceil((T - self.timeChannel.value) / chDict['DeltaT'].value)))
+
+        if self.plan is not None:
+            self.runPlan(T)
+        else:
+            timeChannel = self.timeChannel
+            while timeChannel.value < T:
+                self.step()
+        self.history.flush()
+
+    def runPlan(self, T):
+        plan = self.plan
+        plan.load()
+        vals, step, append = plan.vals, plan.step, self.history.append
+        timeSlot = plan.slot(self.timeChannel)
+        recordVals = rowGetter([plan.slot(ch) for ch in self.recorded])
+
+        while vals[timeSlot] < T:
+            step()
+            append(recordVals(vals))
+        plan.store()
 
     def getChVal(self, channel):
-        ind = self.channelNames.index(channel)
-        return [timePt[ind] for timePt in self.history]
+        return self.history.column(channel)
 
-    def plotVals(self, channelList: List[List[DataChannel]]):
+    def plotVals(self, channelList: List[List[DataChannel]], method='minmax', pointsPerPixel=2, show=True):
+        # each line is downsampled (see Downsample.py, method None plots every sample) to about the axes'
+        # pixel width; zooming or panning refetches the visible window from the history at full detail
         import matplotlib.pyplot as plt
+        from Downsample import downsample, visibleSlice
 
         N = len(channelList)
         timeVal = self.getChVal('Time')
+        fig = plt.gcf()
+        lines = {}
+
+        def nOut(ax): return max(int(ax.get_window_extent().width * pointsPerPixel), 16)
 
+        first = None
         for i, channels in enumerate(channelList):
-            plt.subplot(N, 1, i+1)
+            ax = plt.subplot(N, 1, i+1, sharex=first)
+            first = first or ax
             for ch in channels:
                 chVal = self.getChVal(ch)
-                plt.plot(timeVal, chVal, label=ch)
+                line, = plt.plot(*downsample(timeVal, chVal, nOut(ax), method), label=ch)
+                lines.setdefault(ax, []).append((line, ch))
             plt.legend(loc="upper left")
 
-        plt.show()
+        def refetch(ax):
+            timeVal = self.getChVal('Time')
+            window = visibleSlice(timeVal, *ax.get_xlim())
+            for line, ch in lines[ax]:
+                line.set_data(*downsample(timeVal[window], self.getChVal(ch)[window], nOut(ax), method))
+
+        if method is not None:
+            for ax in lines:
+                ax.callbacks.connect('xlim_changed', refetch)
+
+        if show:
+            plt.show()
+        return fig
 
-def func2Poster(name, func):
+def func2Poster(name, func, **options):
     from inspect import signature
-    return ['{}Sys'.format(name), list(signature(func).parameters), [name], func]
+    return ['{}Sys'.format(name), list(signature(func).parameters), [name], func] + ([options] if options else [])
+
+def rowGetter(slots):
+    # v -> tuple of v[slot] for slots, also for a single slot (itemgetter returns the bare value then)
+    if len(slots) == 1:
+        slot, = slots
+        return lambda v: (v[slot],)
+    return itemgetter(*slots) if slots else lambda v: ()
 
 def fillOutChannels(channels):
     for ch in channels:
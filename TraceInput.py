@@ -0,0 +1,156 @@
+import os
+import csv
+import json
+import hashlib
+from itertools import islice
+import numpy as np
+from HistoryStore import StreamingHistory
+from SaturationTable import CACHEDIR
+
+# Recorded input traces (plant historian exports). A CSV is converted once into the StreamingHistory layout,
+# one raw float64 file per column, and read back through np.memmap, so memory stays constant in trace length.
+
+TRACEDIR = os.path.join(CACHEDIR, 'traces')
+
+
+def _parseTime(values):
+    # numbers are taken as minutes, anything else as ISO timestamps -> minutes since the epoch
+    try:
+        return np.array(values, dtype=float)
+    except ValueError:
+        return np.array(values, dtype='datetime64[s]').astype(np.int64) / 60
+
+
+def convertTrace(csvPath, cacheDir=None, timeColumn='Time', chunkRows=65536):
+    # -> directory readable by StreamingHistory.open, rebuilt only when the CSV changes
+    st = os.stat(csvPath)
+    source = {'path': os.path.abspath(csvPath), 'size': st.st_size, 'mtime': st.st_mtime}
+    if cacheDir is None:
+        digest = hashlib.sha256(json.dumps(source, sort_keys=True).encode()).hexdigest()[:16]
+        cacheDir = os.path.join(TRACEDIR, '{}_{}'.format(os.path.splitext(os.path.basename(csvPath))[0], digest))
+
+    sourceFile = os.path.join(cacheDir, 'source.json')
+    if os.path.exists(sourceFile):
+        with open(sourceFile) as f:
+            if json.load(f) == source:
+                return cacheDir
+
+    with open(csvPath, newline='') as f:
+        reader = csv.reader(f)
+        names = [name.strip() for name in next(reader)]
+        if timeColumn not in names:
+            raise ValueError('{}: no {} column in {}'.format(csvPath, timeColumn, names))
+        t = names.index(timeColumn)
+        order = [t] + [i for i in range(len(names)) if i != t]  # time first
+        store = StreamingHistory(cacheDir, [names[i] for i in order], chunkRows)
+        last = -np.inf
+        while True:
+            rows = list(islice(reader, chunkRows))
+            if not rows:
+                break
+            cols = list(zip(*rows))
+            time = _parseTime(cols[t])
+            if np.any(np.diff(time) <= 0) or time[0] <= last:
+                raise ValueError('{}: {} must be strictly increasing'.format(csvPath, timeColumn))
+            last = time[-1]
+            store.extend(np.column_stack([time] + [np.array(cols[i], dtype=float) for i in order[1:]]))
+        store.close()
+
+    with open(sourceFile, 'w') as f:
+        json.dump(source, f)
+    return cacheDir
+
+
+class TraceInput:
+    # System function Time -> value, linear interpolation of one recorded column.
+    # Time maps to trace time as start + Time * timeScale; outside the trace the end values hold, or the
+    # trace repeats with loop=True. Lookups keep a cursor since simulation time only moves forward.
+    def __init__(self, path, column, timeColumn='Time', start=None, timeScale=1, loop=False):
+        if path.endswith('.csv'):
+            path = convertTrace(path, timeColumn=timeColumn)
+        store = StreamingHistory.open(path)
+        self.path = path
+        self.column = column
+        self.times = store.column(store.channelNames[0])
+        self.values = store.column(column)
+        self.n = len(self.times)
+        self.start = self.times[0] if start is None else start
+        self.timeScale = timeScale
+        self.loop = loop
+        self.span = self.times[-1] - self.times[0]
+        self.i = 0
+
+    def __call__(self, Time):
+        t = self.start + Time * self.timeScale
+        if np.ndim(t):
+            return self.batch(t)
+
+        if self.loop and self.span > 0:
+            t = self.times[0] + (t - self.times[0]) % self.span
+        times = self.times
+        if t <= times[0]:
+            return float(self.values[0])
+        if t >= times[-1]:
+            return float(self.values[-1])
+
+        i = self.i
+        if not times[i] <= t < times[i + 1]:
+            if times[i + 1] <= t < times[min(i + 2, self.n - 1)]:
+                i += 1  # usual case, one sample further
+            else:
+                i = int(np.searchsorted(times, t, side='right')) - 1
+            self.i = i
+        t0, t1 = times[i], times[i + 1]
+        v0, v1 = self.values[i], self.values[i + 1]
+        return float(v0 + (t - t0) / (t1 - t0) * (v1 - v0))
+
+    def batch(self, t):
+        # array of times, only the spanned slice of the trace is read
+        if self.loop and self.span > 0:
+            t = self.times[0] + (t - self.times[0]) % self.span
+        lo = max(int(np.searchsorted(self.times, np.min(t), side='right')) - 1, 0)
+        hi = min(int(np.searchsorted(self.times, np.max(t), side='left')) + 1, self.n)
+        return np.interp(t, self.times[lo:hi], self.values[lo:hi])
+
+
+def tracePoster(channel, path, column=None, **options):
+    # poster driving channel from a trace column (default: column named like the channel)
+    return ['{}Trace'.format(channel), ['Time'], [channel], TraceInput(path, column or channel, **options)]
+
+
+def replacePoster(posters, name, poster):
+    # copy of posters with the system registered as name swapped for poster
+    if name not in [P[0] for P in posters]:
+        raise KeyError(name)
+    return [poster if P[0] == name else P for P in posters]
+
+
+if __name__ == '__main__':
+    import tempfile
+    import time
+    from RefrigeratorSimulator import posters, makeChannels, toMin
+    from SystemEvents import TimedSimulation
+
+    # one year of synthetic one-minute historian data
+    csvPath = os.path.join(tempfile.mkdtemp(), 'plant.csv')
+    minutes = np.arange(toMin(365), dtype=float)
+    rng = np.random.default_rng(0)
+    with open(csvPath, 'w') as f:
+        f.write('Time,Qadded,AmbientTemp\n')
+        for block in np.array_split(minutes, 50):
+            qadded = 4000 - 2000 * np.cos(2 * np.pi * block / toMin(2)) ** 4 + 500 * rng.random(len(block))
+            ambient = 15 + 10 * np.sin(2 * np.pi * block / toMin(365)) + 5 * np.sin(2 * np.pi * block / toMin(1))
+            np.savetxt(f, np.column_stack([block, qadded, ambient]), fmt='%.6g', delimiter=',')
+
+    t = time.perf_counter()
+    cacheDir = convertTrace(csvPath)
+    print('converted {} rows in {:.1f} s -> {}'.format(len(minutes), time.perf_counter() - t, cacheDir))
+
+    tracePosters = replacePoster(posters, 'QaddedSys', tracePoster('Qadded', cacheDir))
+    tracePosters.append(tracePoster('AmbientTemp', cacheDir))
+    sim = TimedSimulation(tracePosters, makeChannels())
+    sim.compile()
+    t = time.perf_counter()
+    sim.runSim(toMin(30))
+    print('30 days driven by the trace in {:.2f} s, TotalEnergy {:.0f} kWh'.format(
+        time.perf_counter() - t, sim.getChVal('TotalEnergy')[-1]))
@@ -1,9 +1,12 @@
+import os
+import sys
 import numpy as np
-import CoolProp.CoolProp as CP
-from scipy.optimize import root
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.linear_model import LinearRegression
+from SaturationTable import getBackend, COOLPROPVERSION
+from AnalysisCache import defaultCache
+from PolySurrogate import PolySurrogate
 
+# scipy and sklearn are imported by the solvers and fits that use them, importing this module for its
+# helpers (RefrigeratorSimulator does) stays cheap
 
 #  Helper Functions
 
@@ -12,10 +15,17 @@ def toPASCAL(psia): return 6894.76 * psia
 def toCelsius(Kelvin): return Kelvin - 273.15
 
 
+SPFITFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spFit.json')  # fitted SP response curve
+
+
 # Thermodynamic Parameters
 
 class CycleParams:
-    def __init__(self):
+    TARGETS = {'ALPHA': (5000, 10), 'BETA': (6600, 10), 'EFF': (1600, .5)}  # calibration value, initial guess
+
+    def __init__(self, backend='exact', coeffs=None, cache=None):
+        self.backend = backend
+        self.sat = getBackend(backend)  # saturation property backend, 'exact' or 'table'
         self.SP: float = 18       # [14, 25] psia
         self.DP: float = 150      # [150, 250] psia
         self.TROOM: float = 0     # [-5, 5] Celsius
@@ -26,39 +36,53 @@ class CycleParams:
         self.EVAPDUTY = .5
         self.CONDUTY  = .5
 
-        self.ALPHA = self.getCoeff(self.Qin, 5000, 10)
-        self.BETA = self.getCoeff(self.Qout, 6600, 10)
-        self.EFF = self.getCoeff(self.Power, 1600, .5)
+        if coeffs is None and cache is not None:  # AnalysisCache keyed by inputs()
+            coeffs = tuple(cache.memo('calibration', self.inputs(), lambda: {'coeffs': self.calibrate()})['coeffs'])
+        if coeffs is None:
+            coeffs = self.calibrate()
+        self.ALPHA, self.BETA, self.EFF = coeffs  # (ALPHA, BETA, EFF)
+
+    def inputs(self):
+        # everything the calibration depends on
+        return {'backend': self.backend, 'coolprop': COOLPROPVERSION, 'targets': self.TARGETS,
+                'SP': self.SP, 'DP': self.DP, 'TROOM': self.TROOM, 'TAMB': self.TAMB, 'MLOW': self.MLOW,
+                'COMPDUTY': self.COMPDUTY, 'EVAPDUTY': self.EVAPDUTY, 'CONDUTY': self.CONDUTY}
+
+    def calibrate(self):
+        return (self.getCoeff(self.Qin, *self.TARGETS['ALPHA']),
+                self.getCoeff(self.Qout, *self.TARGETS['BETA']),
+                self.getCoeff(self.Power, *self.TARGETS['EFF']))
 
     def Qin(self, alpha=None):
         if alpha is None:
             alpha = self.ALPHA
-        tempDiff = self.TROOM - toCelsius(CP.PropsSI('T', 'P', toPASCAL(self.SP), 'Q', 1, 'Ammonia'))
+        tempDiff = self.TROOM - toCelsius(self.sat.T(self.SP))
         return alpha * self.MLOW * self.EVAPDUTY * tempDiff
     
     def mHigh(self):
-        return CP.PropsSI('D', 'P', toPASCAL(self.SP), 'Q', 1, 'Ammonia') * self.COMPDUTY
+        return self.sat.D(self.SP) * self.COMPDUTY
     
     def Qout(self, beta=None):
         if beta is None:
             beta = self.BETA
-        tempDiff = toCelsius(CP.PropsSI('T', 'P', toPASCAL(self.DP), 'Q', 1, 'Ammonia')) - self.TAMB
+        tempDiff = toCelsius(self.sat.T(self.DP)) - self.TAMB
         return beta * self.mHigh() * self.CONDUTY * tempDiff
     
     def Power(self, eff=None):
         if eff is None:
             eff = self.EFF
-        h1 = CP.PropsSI('H', 'P', toPASCAL(self.SP), 'Q', 1, 'Ammonia')
-        s = CP.PropsSI('S', 'P', toPASCAL(self.SP), 'Q', 1, 'Ammonia')
-        h2 = CP.PropsSI('H', 'P', toPASCAL(self.DP), 'S', s, 'Ammonia')  # assume isoentropic compression
+        h1 = self.sat.H(self.SP)
+        h2 = self.sat.Hcomp(self.DP, self.SP)  # assume isoentropic compression
         return self.mHigh() * (h2 - h1) * (1/eff) / 1000  # kW
 
     def getCoeff(self, func, VAL, guess):
+        from scipy.optimize import root
+
         def fixedFunc(param):
             return func(param) - VAL
         
         sol = root(fixedFunc, guess)
-        if sol.success:
+        if sol.success or abs(sol.fun[0]) < 1e-9 * abs(VAL):  # hybr can flag slow progress after converging
             return sol.x[0]
         else:
             print('No solution found for {} and value {}.'.format(func.__name__, VAL))
@@ -77,15 +101,61 @@ def fixedPointFunc(cParams):
     return f
 
 
-def getPoints():
-    CP = CycleParams()
+DUTYGRID = np.arange(0.1, 1.01, .02)  # default 46 point duty axis
+
+
+def dutyGrid(lo=0.1, hi=1.0, n=46): return np.linspace(lo, hi, n)
+
+
+def getPoints(compDuties=DUTYGRID, evapDuties=DUTYGRID, method='vectorized', workers=None, backend='exact',
+              cache=None):
+    # method: 'vectorized' (one secant iteration over the whole grid), 'pool' (vectorized shards of
+    # compDuties in worker processes) or 'serial' (one scipy root per point)
+    if method not in ('vectorized', 'pool', 'serial'):
+        raise ValueError('Unknown method {}, expected vectorized, pool or serial'.format(method))
+    CP = CycleParams(backend, cache=cache)
     print('COEFFICIENTS: ', CP.ALPHA, CP.BETA, CP.EFF)
-    spData = np.zeros((46, 46))
-    qinData = np.zeros((46, 46))
-    cDutyData = np.zeros((46, 46))
 
-    for i, compDuty in enumerate(np.arange(0.1, 1.01, .02)):
-        for j, evapDuty in enumerate(np.arange(0.1, 1.01, .02)):
+    if cache is None:
+        return solvePoints(CP, compDuties, evapDuties, method, workers)
+
+    params = {'cycle': CP.inputs(), 'coeffs': (CP.ALPHA, CP.BETA, CP.EFF), 'method': method,
+              'compDuties': np.asarray(compDuties), 'evapDuties': np.asarray(evapDuties)}
+    names = ('spData', 'qinData', 'cDutyData')
+    data = cache.memo('steadyMap', params,
+                      lambda: dict(zip(names, solvePoints(CP, compDuties, evapDuties, method, workers))))
+    return tuple(data[name] for name in names)
+
+
+def solvePoints(CP, compDuties, evapDuties, method, workers=None):
+    if method == 'serial':
+        return solveSerial(CP, compDuties, evapDuties)
+    if method == 'vectorized':
+        return solveGrid(CP, compDuties, evapDuties)
+    if method == 'pool':
+        from concurrent.futures import ProcessPoolExecutor
+
+        shards = [sh for sh in np.array_split(np.asarray(compDuties), workers or os.cpu_count()) if len(sh)]
+        jobs = [(sh, evapDuties, (CP.ALPHA, CP.BETA, CP.EFF), CP.backend) for sh in shards]
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(_solveShard, jobs))
+        return tuple(np.vstack(data) for data in zip(*parts))
+
+
+def _solveShard(job):
+    compDuties, evapDuties, coeffs, backend = job
+    return solveGrid(CycleParams(backend, coeffs), compDuties, evapDuties)
+
+
+def solveSerial(CP, compDuties, evapDuties):
+    from scipy.optimize import root
+
+    spData = np.zeros((len(compDuties), len(evapDuties)))
+    qinData = np.zeros((len(compDuties), len(evapDuties)))
+    cDutyData = np.zeros((len(compDuties), len(evapDuties)))
+
+    for i, compDuty in enumerate(compDuties):
+        for j, evapDuty in enumerate(evapDuties):
             
             CP.COMPDUTY = compDuty
             CP.EVAPDUTY = evapDuty
@@ -102,6 +172,50 @@ def getPoints():
     return spData, qinData, cDutyData
 
 
+def solveGrid(CP, compDuties, evapDuties, guess=18, tol=1e-10, ftol=1e-6, maxIter=50):
+    # secant iteration on every grid point at once, CycleParams methods evaluate elementwise on arrays.
+    # A point converges once the step is below tol (relative) and the residual below ftol (kW); a point whose
+    # residual stops changing (flat secant) without reaching ftol has no solution and is left at 0
+    cDuty, eDuty = np.meshgrid(np.asarray(compDuties, dtype=float), np.asarray(evapDuties, dtype=float), indexing='ij')
+    shape = cDuty.shape
+    cDuty, eDuty = cDuty.ravel(), eDuty.ravel()  # CoolProp vectorizes over 1-D arrays only
+    saved = CP.SP, CP.COMPDUTY, CP.EVAPDUTY
+    f = fixedPointFunc(CP)
+
+    def residual(idx, sp):
+        CP.COMPDUTY, CP.EVAPDUTY = cDuty[idx], eDuty[idx]
+        return f(sp)
+
+    active = np.arange(cDuty.size)  # points still iterating
+    x0 = np.full(cDuty.size, float(guess))
+    x1 = x0 * 1.01
+    f0, f1 = residual(active, x0), residual(active, x1)
+    ok = np.zeros(cDuty.size, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(maxIter):
+            xa, xb, fa, fb = x0[active], x1[active], f0[active], f1[active]
+            df = fb - fa
+            xn = xb - np.where(df == 0, 0, fb * (xb - xa) / df)
+            x0[active], f0[active] = xb, fb
+            x1[active], f1[active] = xn, residual(active, xn)
+
+            fn = f1[active]
+            conv = (np.abs(xn - xb) <= tol * np.abs(xn)) & (np.abs(fn) <= ftol)
+            ok[active[conv]] = True
+            active = active[~conv & (df != 0) & np.isfinite(xn)]
+            if not active.size:
+                break
+
+    ok &= np.isfinite(x1) & np.isfinite(f1)
+    CP.COMPDUTY, CP.EVAPDUTY = cDuty, eDuty
+    CP.SP = x1
+    spData = np.where(ok, x1, 0)
+    qinData = np.where(ok, CP.Qin(), 0)
+    cDutyData = np.where(ok, cDuty, 0)
+    CP.SP, CP.COMPDUTY, CP.EVAPDUTY = saved
+    return spData.reshape(shape), qinData.reshape(shape), cDutyData.reshape(shape)
+
+
 def reshapeData(spData, cDutyData, qinData):
     SP = spData.flatten()
     QIN = qinData.flatten()
@@ -111,7 +225,14 @@ def reshapeData(spData, cDutyData, qinData):
     y = SP
     return X, y
 
-def polyFit(X, y, deg=1):
+def polyFit(X, y, deg=1, cache=None):
+    if cache is not None:
+        return cache.memo('polyFit', {'X': np.asarray(X), 'y': np.asarray(y), 'deg': deg},
+                          lambda: {'coef': polyFit(X, y, deg)})['coef']
+
+    from sklearn.preprocessing import PolynomialFeatures
+    from sklearn.linear_model import LinearRegression
+
     poly = PolynomialFeatures(degree=deg)
     Xpoly = poly.fit_transform(X)
     reg = LinearRegression(fit_intercept=False).fit(Xpoly, y)
@@ -121,12 +242,7 @@ def polyFit(X, y, deg=1):
 # Plotting
     
 def gen3d(cDutyData, qinData, coef, deg):
-    poly = PolynomialFeatures(degree=deg)
-    spData = np.zeros((46, 46))
-    for i in range(46):
-        for j in range(46):
-            spData[i, j] = np.dot(poly.fit_transform([[cDutyData[i, j], qinData[i, j]]]), coef)[0]
-    return spData
+    return PolySurrogate(coef, deg)(cDutyData, qinData)
 
 def plot3d(spDatas, cDutyData, qinData):
     import matplotlib.pyplot as plt
@@ -141,10 +257,13 @@ def plot3d(spDatas, cDutyData, qinData):
 
 
 if __name__ == '__main__':
-    spData, qinData, cDutyData = getPoints()
+    cache = defaultCache()
+    spData, qinData, cDutyData = getPoints(cache=cache)
     print('generated points')
     X, y = reshapeData(spData, cDutyData, qinData)
-    coef = polyFit(X, y, deg=2)
+    coef = polyFit(X, y, deg=2, cache=cache)
     spDatafit = gen3d(cDutyData, qinData, coef, 2)
     print([round(c, 4) for c in coef])
+    if '--save' in sys.argv:
+        PolySurrogate(coef, 2).save(SPFITFILE)  # picked up by RefrigeratorSimulator.eqSuction
     plot3d([spData, spDatafit], cDutyData, qinData)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+import RefrigeratorSimulator as R
+from SystemEvents import DataChannel, TimedSimulation, func2Poster
+from AdaptiveSimulation import AdaptiveSimulation
+
+EULER = {'RoomTemp': R.setRoomTemp, 'SuctionPressure': R.setSuctionPressure, 'TotalEnergy': R.setTotalEnergy}
+TOLERANCE = {'SuctionPressure': 1e-4, 'RoomTemp': 1e-6, 'TotalEnergy': .05}  # psia, C, kWh
+
+
+def fixedStep(T, DeltaT):
+    # adaptivePosters with euler setters in place of the derivative posters, compiled fixed-step run
+    posters = [['timer', ['Time', 'DeltaT'], ['Time'], R.timer]]
+    posters += [func2Poster(P[2][0], EULER[P[2][0]]) if len(P) > 4 and P[4].get('derivative') else P
+                for P in R.adaptivePosters]
+    channels = R.makeAdaptiveChannels()
+    channels[1].value = DeltaT
+    np.random.seed(0)
+    sim = TimedSimulation(posters, channels)
+    sim.compile()
+    sim.runSim(T)
+    return sim
+
+
+def test_matches_extrapolated_fixed_step_reference():
+    T = R.toMin(1) / 4
+    np.random.seed(0)
+    adaptive = AdaptiveSimulation(R.adaptivePosters, R.makeAdaptiveChannels())
+    adaptive.runSim(T)
+    assert adaptive.steps < 100  # fixed steps of .04 take 9000
+
+    # euler is first order, 2 y(h) - y(2h) cancels its leading error term
+    time = adaptive.getChVal('Time')
+    fine, coarse = fixedStep(T, .04), fixedStep(T, .08)
+    for name, tol in TOLERANCE.items():
+        ref = [np.interp(time, sim.getChVal('Time'), sim.getChVal(name)) for sim in (fine, coarse)]
+        assert np.abs(adaptive.getChVal(name) - (2 * ref[0] - ref[1])).max() < tol, name
+
+
+def test_sampled_posters_fire_on_their_period_boundaries():
+    calls = []
+
+    def probe(Time):
+        calls.append(Time)
+        return Time
+
+    channels = [DataChannel('Time', 0), DataChannel('DeltaT', 1), DataChannel('x', 1.), DataChannel('Held', -1.)]
+    posters = [['xSys', ['x'], ['x'], lambda x: -.01 * x, {'derivative': True}],
+               ['ProbeSys', ['Time'], ['Held'], probe, {'period': 7.5}]]
+    sim = AdaptiveSimulation(posters, channels, hInit=3)
+    sim.runSim(60)
+
+    assert calls == [7.5 * i for i in range(9)]
+    time, held = sim.getChVal('Time'), sim.getChVal('Held')
+    assert set(calls) <= set(time)  # integration steps land on every sample time
+    assert held[0] == -1  # recorded before the first sample
+    assert (held[1:] == 7.5 * np.floor(time[1:] / 7.5)).all()  # held until the next sample
+    assert np.isclose(sim.getChVal('x')[-1], np.exp(-.6), rtol=1e-6)
+
+
+def test_compile_and_incremental_rejected():
+    sim = AdaptiveSimulation(R.adaptivePosters, R.makeAdaptiveChannels())
+    with pytest.raises(ValueError):
+        sim.compile()
+    with pytest.raises(ValueError):
+        sim.incremental()
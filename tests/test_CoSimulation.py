@@ -0,0 +1,32 @@
+import asyncio
+import socket
+import RefrigeratorSimulator as R
+from CoSimulation import CoSimulation, OUTPUTS, servePlant, slowed
+from SaturationTable import satT
+
+
+def freePort():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_instance_runs_twice_with_threaded_poster():
+    satT(18)  # CoolProp import, would hold the first threaded calls past the end of a short run
+    controllers = [[*P[:3], slowed(P[3], .001)] if P[0] == 'SlideValveSys' else P
+                   for P in R.posters if P[2][0] in OUTPUTS]
+    cosim = CoSimulation(controllers, R.makeChannels(), threaded=('SlideValveSys',))
+
+    async def session():
+        port = freePort()
+        plant = asyncio.create_task(servePlant(port=port, interval=.01, steps=10))
+        await asyncio.sleep(.1)  # server listening
+        report = await cosim.run(port=port)
+        await plant
+        return report
+
+    first = asyncio.run(session())
+    second = asyncio.run(session())
+    assert first['samples'] == 10 and second['samples'] == 20
+    slide = second['posters']['SlideValveSys']
+    assert slide['failures'] == 0 and slide['runs'] > first['posters']['SlideValveSys']['runs']
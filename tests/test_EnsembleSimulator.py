@@ -0,0 +1,25 @@
+import numpy as np
+import RefrigeratorSimulator as R
+from SystemEvents import TimedSimulation
+from EnsembleSimulator import ensembleSimulation
+from PlantTopology import PlantTopology
+
+CHANNELS = ('SuctionPressure', 'RoomTemp', 'TotalQin', 'TotalEnergy')
+
+
+def noiselessLoad(Time): return 4000 - 2000 * np.cos(2 * np.pi * Time / R.toMin(2)) ** 4
+
+
+def test_matches_scalar_simulation_on_another_plant():
+    plant = PlantTopology(8, 20)
+    posters = [['QaddedSys', ['Time'], ['Qadded'], noiselessLoad] if P[0] == 'QaddedSys' else P
+               for P in R.makePosters(plant)]
+    scalar = TimedSimulation(posters, R.makeChannels(plant))
+    scalar.runSim(R.toMin(1))
+    ensemble = ensembleSimulation(2, plant=plant, QaddedNoise=0)
+    ensemble.runSim(R.toMin(1))
+
+    for name in CHANNELS:
+        expected = scalar.getChVal(name)
+        for run in ensemble.getChVal(name).T:
+            assert np.allclose(run, expected, rtol=1e-9, atol=1e-9), name
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import RefrigeratorSimulator as R
+from SystemEvents import TimedSimulation
+from EventSimulation import EventSimulation
+
+CONTROLLERS = ('SlideValveSys', 'EvaporatorSys')
+
+
+def constLoad(Time): return 3000.
+
+
+def plant(controllers=True):
+    return [['QaddedSys', ['Time'], ['Qadded'], constLoad] if P[0] == 'QaddedSys' else P
+            for P in R.makePosters() if controllers or P[0] not in CONTROLLERS]
+
+
+def runBoth(posters, T, DeltaT=1, **tolerance):
+    runs = []
+    for sim, options in ((TimedSimulation, {}), (EventSimulation, tolerance)):
+        channels = R.makeChannels()
+        channels[1].value = DeltaT
+        s = sim(posters, channels, **options)
+        s.runSim(T)
+        runs.append(s)
+    return runs
+
+
+def budget(sim, history):
+    return sim.atol + sim.rtol * np.abs(history).max(axis=0)
+
+
+def test_smooth_plant_within_tolerance_over_the_run():
+    fixed, event = runBoth(plant(controllers=False), R.toMin(2), rtol=1e-4)
+    a, b = fixed.history.toArray(), event.history.toArray()
+    assert event.jumps > 0 and a.shape == b.shape
+    assert (np.abs(a - b).max(axis=0) <= budget(event, a)).all()
+    assert (event.errorEstimate <= budget(event, a)).all()
+
+
+def test_error_estimate_within_budget_with_feedback():
+    fixed, event = runBoth(plant(), R.toMin(1), DeltaT=.1, rtol=1e-4)
+    assert event.jumps > 0
+    assert (event.errorEstimate <= budget(event, fixed.history.toArray())).all()
+
+
+def test_no_jumps_matches_fixed_step():
+    np.random.seed(0)
+    fixed = TimedSimulation(R.makePosters(), R.makeChannels())
+    fixed.compile()
+    fixed.runSim(R.toMin(1))
+    np.random.seed(0)
+    event = EventSimulation(R.makePosters(), R.makeChannels())
+    event.runSim(R.toMin(1))
+    assert event.jumps == 0
+    assert np.array_equal(fixed.history.toArray(), event.history.toArray())
+
+
+def test_profile_rejected():
+    sim = EventSimulation(plant(), R.makeChannels())
+    with pytest.raises(ValueError):
+        sim.profile()
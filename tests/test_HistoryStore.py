@@ -0,0 +1,45 @@
+import numpy as np
+from HistoryStore import StreamingHistory
+import RefrigeratorSimulator as R
+from SystemEvents import TimedSimulation
+
+
+def test_ring_holds_only_the_latest_chunk(tmp_path):
+    rows = np.arange(30.).reshape(10, 3)
+    with StreamingHistory(str(tmp_path), ['a', 'b', 'c'], chunkSize=4) as history:
+        for row in rows[:5]:
+            history.append(row)
+        history.extend(rows[5:7])
+        for row in rows[7:]:
+            history.append(row)
+        assert history.ring.shape == (3, 4)
+        assert history.last('c') == rows[-1, 2]
+        assert np.array_equal(history.toArray(), rows)
+        history.append(rows[0])
+    assert history.handles is None
+
+    stored = StreamingHistory.open(str(tmp_path))
+    assert len(stored) == 11
+    assert np.array_equal(stored.column('b'), np.append(rows[:, 1], rows[0, 1]))
+
+
+def test_reading_writes_no_header(tmp_path):
+    history = StreamingHistory(str(tmp_path), ['a'], chunkSize=8)
+    history.append([1.])
+    assert list(history.column('a')) == [1.]
+    assert len(StreamingHistory.open(str(tmp_path))) == 0  # header written on flush and close only
+    history.flush()
+    assert len(StreamingHistory.open(str(tmp_path))) == 1
+    history.close()
+
+
+def test_streamed_simulation_matches_in_memory(tmp_path):
+    np.random.seed(0)
+    memory = TimedSimulation(R.makePosters(), R.makeChannels())
+    memory.runSim(R.toMin(1))
+    np.random.seed(0)
+    with TimedSimulation(R.makePosters(), R.makeChannels(), chunkSize=64, historyPath=str(tmp_path)) as streamed:
+        streamed.runSim(R.toMin(1))
+    assert streamed.history.handles is None
+    assert np.array_equal(memory.history.toArray(), streamed.history.toArray())
+    assert np.array_equal(streamed.getChVal('RoomTemp'), memory.getChVal('RoomTemp'))
@@ -0,0 +1,38 @@
+import time
+import mip
+from MPCController import MPCController
+from RefrigeratorSimulator import optController
+from PlantTopology import PLANT
+
+STATES = [(30, -5, 0), (22, -5, 300), (30, -5, 0)]  # (SuctionPressure, RoomTemp, Qadded), feasible
+SLIDES = [1] * PLANT.compressors
+
+
+def test_same_plans_as_optController():
+    controller = MPCController()
+    for state in STATES:
+        assert controller(*state, SLIDES) == optController(*state, SLIDES)
+        assert controller.status == mip.OptimizationStatus.OPTIMAL
+    assert len(controller.dynRows) == 2 * (controller.T - 1)
+
+
+def test_not_slower_than_optController():
+    def best(solve, runs=2):
+        times = []
+        for _ in range(runs):
+            t = time.perf_counter()
+            solve()
+            times.append(time.perf_counter() - t)
+        return min(times)
+
+    optController(*STATES[0], SLIDES)  # loads CBC
+    legacy = best(lambda: [optController(*state, SLIDES) for state in STATES])
+    persistent = best(lambda: [controller(*state, SLIDES) for controller in [MPCController()] for state in STATES])
+    assert persistent <= 1.1 * legacy  # same model, the build and unchanged rows are saved
+
+
+def test_failed_solve_reports_status_and_switches_off():
+    controller = MPCController(T=5)
+    slides, evaporators = controller(18, 10, 5000, SLIDES)  # room too warm to reach TMPSET
+    assert controller.status != mip.OptimizationStatus.OPTIMAL and controller.failures == 1
+    assert slides == [-1] * PLANT.compressors and evaporators == [0] * PLANT.evaporators
@@ -0,0 +1,22 @@
+import numpy as np
+from PolySurrogate import PolySurrogate
+
+
+def test_scalar_and_batch_agree_and_save_round_trips(tmp_path):
+    coef = [26.7, -92.9, .0067, 70.5, -.0046, 0.]  # 1, d, q, d^2, d q, q^2
+    surrogate = PolySurrogate(coef, 2)
+    d, q = .4, 3000.
+    expected = 26.7 - 92.9 * d + .0067 * q + 70.5 * d ** 2 - .0046 * d * q
+    assert np.isclose(surrogate(d, q), expected, rtol=1e-14)
+    assert np.allclose(surrogate(np.array([d, .9]), q), [expected, surrogate(.9, q)], rtol=1e-14)
+
+    path = tmp_path / 'fit.json'
+    surrogate.save(path)
+    assert path.read_text().endswith('}\n')
+    assert PolySurrogate.load(path).coef == surrogate.coef
+
+
+def test_general_layout_matches_batch():
+    surrogate = PolySurrogate([1., -2., .5, .25, 0., 3., -1., .125, 2., .75], 3)
+    x0, x1 = np.linspace(-1, 2, 7), np.linspace(3, -2, 7)
+    assert np.allclose([surrogate(a, b) for a, b in zip(x0, x1)], surrogate(x0, x1), rtol=1e-14)
@@ -0,0 +1,20 @@
+import numpy as np
+import RefrigeratorSimulator as R
+from SystemEvents import TimedSimulation
+
+
+def test_enable_before_compile_counts_and_disable_restores_the_plan():
+    np.random.seed(0)
+    sim = TimedSimulation(R.makePosters(), R.makeChannels())
+    profiler = sim.profile()
+    plan = sim.compile()
+    sim.runSim(50)
+    assert profiler.steps == len(sim.history) - 1
+    assert profiler.update['SuctionPressureSys'].count == profiler.steps
+
+    profiler.disable()
+    namespace = plan.stepFunc.__globals__
+    assert all(namespace['f{}'.format(k)] is P.system for k, P in enumerate(plan.posters))
+    assert not any(hasattr(P.system, '__wrapped__') for P in plan.posters)
+    sim.runSim(100)
+    assert profiler.update['SuctionPressureSys'].count == profiler.steps
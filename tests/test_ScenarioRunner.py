@@ -0,0 +1,34 @@
+from ScenarioRunner import ScenarioRunner
+
+
+def energies(runner, scenarios):
+    results = sorted(runner.iterate(scenarios), key=lambda r: r[0])
+    return [kpis['TotalEnergy'] for _, _, kpis in results]
+
+
+def test_unseeded_scenarios_get_their_own_streams():
+    scenarios = [{}] * 4
+    first = energies(ScenarioRunner(200, workers=2, chunkSize=2, warmUp=0, seed=1), scenarios)
+    assert len(set(first)) == len(scenarios)  # identical runs would mean shared random state
+
+    again = energies(ScenarioRunner(200, workers=2, chunkSize=1, warmUp=0, seed=1), scenarios)
+    assert again == first  # per scenario, not per worker or chunk
+
+
+def test_seed_override_wins():
+    runner = ScenarioRunner(200, workers=2, chunkSize=1, warmUp=0, seed=1)
+    a, b = energies(runner, [{'seed': 7}, {'seed': 7}])
+    assert a == b
+
+
+def test_controller_override_and_plant_posters_reach_the_workers():
+    from functools import partial
+    import RefrigeratorSimulator as R
+    from PlantTopology import PlantTopology
+
+    runner = ScenarioRunner(20, workers=2, warmUp=0, seed=1)
+    assert len(energies(runner, [{'SlideValveSys': R.feedbackSlideValves}])) == 1
+
+    plant = PlantTopology(8, 20)
+    runner = ScenarioRunner(20, R.makePosters(plant), partial(R.makeChannels, plant), workers=2, warmUp=0, seed=1)
+    assert len(energies(runner, [{}, {}])) == 2
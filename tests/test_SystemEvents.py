@@ -0,0 +1,83 @@
+import numpy as np
+from SystemEvents import DataChannel, GroupChannel, SlotChannel, TimedSimulation, fillOutChannels
+
+
+def test_group_leaves_given_channels_untouched():
+    given = [DataChannel('EvaporatorA', 1), DataChannel('EvaporatorB', 0)]
+    group = GroupChannel('EvaporatorsOn', given)
+
+    assert all(type(dC) is DataChannel for dC in given)
+    assert [dC.value for dC in given] == [1, 0]
+    assert all(type(dC) is SlotChannel for dC in group.dataChannels)
+    assert [dC.name for dC in group.dataChannels] == ['EvaporatorA', 'EvaporatorB']
+
+    group.value = [0, 1]
+    assert [dC.value for dC in given] == [1, 0]
+    assert [dC.value for dC in group.dataChannels] == [0, 1]
+
+
+def test_int_members_stay_int():
+    channels = fillOutChannels([GroupChannel('EvaporatorsOn', [DataChannel(str(i), 1) for i in range(3)])])
+    group, members = channels[0], channels[1:]
+    assert group.array.dtype.kind == 'i'
+
+    group.value = [0, 1, 0]
+    members[2].value = 1
+    assert group.array.dtype.kind == 'i'
+    assert list(group.value) == [0, 1, 1]
+
+
+def test_float_write_widens_int_members():
+    group = GroupChannel('SlideValves', [DataChannel('SlideValveA', 1), DataChannel('SlideValveB', -1)])
+    group.dataChannels[0].value = .5  # not truncated to 0
+    assert group.array.dtype.kind == 'f'
+    assert list(group.value) == [.5, -1]
+
+    group.value = np.array([.25, .75])
+    assert list(group.value) == [.25, .75]
+
+
+def test_compiled_short_return_holds_remaining_outputs():
+    def first(Time): return [Time * 2]  # two outputs, one value
+
+    channels = [DataChannel('Time', 0), DataChannel('A', -1), DataChannel('B', -1)]
+    posters = [['timer', ['Time'], ['Time'], lambda Time: Time + 1], ['FirstSys', ['Time'], ['A', 'B'], first]]
+    interpreted = TimedSimulation(posters, channels)
+    interpreted.runSim(3)
+
+    channels = [DataChannel('Time', 0), DataChannel('A', -1), DataChannel('B', -1)]
+    compiled = TimedSimulation(posters, channels)
+    compiled.compile()
+    compiled.runSim(3)
+    assert list(compiled.getChVal('A')) == list(interpreted.getChVal('A')) == [-1, 0, 2, 4]
+    assert list(compiled.getChVal('B')) == [-1] * 4
+
+
+def test_compiled_run_records_a_single_channel():
+    sim = TimedSimulation([['timer', ['Time'], ['Time'], lambda Time: Time + 1]], [DataChannel('Time', 0)])
+    sim.compile()
+    sim.runSim(3)
+    assert list(sim.getChVal('Time')) == [0, 1, 2, 3]
+
+
+def settlingPlant():
+    # the load steps once, the tank settles on it exactly, after that only timer and LoadSys have fresh inputs
+    channels = [DataChannel('Time', 0), DataChannel('Load', 0), DataChannel('Level', 0), DataChannel('Alarm', 0)]
+    posters = [['timer', ['Time'], ['Time'], lambda Time: Time + 1],
+               ['LoadSys', ['Time'], ['Load'], lambda Time: 1. if Time >= 5 else 0.],
+               ['TankSys', ['Load', 'Level'], ['Level'], lambda Load, Level: Level + .5 * (Load - Level)],
+               ['AlarmSys', ['Level'], ['Alarm'], lambda Level: int(Level > .9)]]
+    return posters, channels
+
+
+def test_incremental_skips_settled_posters_and_matches_full_run():
+    full = TimedSimulation(*settlingPlant())
+    full.runSim(100)
+    incremental = TimedSimulation(*settlingPlant())
+    scheduler = incremental.incremental()
+    incremental.runSim(100)
+
+    assert scheduler.skipped > 50
+    assert scheduler.evaluations + scheduler.skipped == 4 * 100
+    assert np.array_equal(incremental.history.toArray(), full.history.toArray())
+    assert list(incremental.getChVal('Alarm')[-3:]) == [1, 1, 1]
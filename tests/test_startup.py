@@ -0,0 +1,9 @@
+import os
+from Benchmarks import checkStartup
+
+
+def test_import_within_budget_on_a_cold_table_cache(tmp_path, monkeypatch):
+    # an empty cache directory: the import must neither need nor build the saturation tables
+    monkeypatch.setenv('REFRIG_CACHE_DIR', str(tmp_path))
+    assert checkStartup() == []
+    assert os.listdir(tmp_path) == []
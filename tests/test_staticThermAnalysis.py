@@ -0,0 +1,21 @@
+import numpy as np
+from staticThermAnalysis import solveGrid
+
+
+class LinearCycle:
+    # residual Qin + Power - Qout = COMPDUTY (SP - 20) + EVAPDUTY: flat in SP, and without a root, at COMPDUTY 0
+    def __init__(self):
+        self.SP, self.COMPDUTY, self.EVAPDUTY = 18, .5, .5
+
+    def Qin(self): return self.COMPDUTY * (self.SP - 20) + self.EVAPDUTY
+
+    def Power(self): return 0 * self.SP
+
+    def Qout(self): return 0 * self.SP
+
+
+def test_flat_residual_is_not_converged():
+    sp, qin, cDuty = solveGrid(LinearCycle(), [0, .5, 1], [.5])
+    assert sp[0, 0] == 0 and qin[0, 0] == 0  # residual stays at .5, the secant stalls
+    assert np.allclose(sp[1:, 0], [19, 19.5])
+    assert np.allclose(cDuty[:, 0], [0, .5, 1])